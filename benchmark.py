@@ -0,0 +1,262 @@
+import csv
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from itertools import product
+from statistics import median
+import rdflib
+from rdflib import Graph
+import populate_basic
+import populate_intermediate
+import query_basic
+import query_intermediate
+import swrl_reasoner
+from flight_index import FlightIndex
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+STAGES = ["basic_ingest", "flight_ingest", "serialize_xml", "parse_xml", "queries", "index", "swrl"]
+
+AIRLINES = [("UA", "United Air Lines Inc."), ("B6", "JetBlue Airways"), ("DL", "Delta Air Lines Inc."),
+            ("AA", "American Airlines Inc."), ("EV", "ExpressJet Airlines Inc."), ("WN", "Southwest Airlines Co."),
+            ("9E", "Endeavor Air Inc."), ("US", "US Airways Inc."), ("MQ", "Envoy Air"), ("AS", "Alaska Airlines Inc.")]
+
+FLIGHT_COLUMNS = ["id", "year", "month", "day", "dep_time", "sched_dep_time", "dep_delay", "arr_time", "sched_arr_time",
+                  "arr_delay", "carrier", "flight", "tailnum", "origin", "dest", "air_time", "distance", "hour", "minute",
+                  "time_hour", "name"]
+
+def _uri(kind, number):
+    return {"type": "uri", "value": f"http://www.wikidata.org/entity/{kind}{number}"}
+
+def _literal(value):
+    return {"type": "literal", "value": str(value)}
+
+def synthetic_airports(n_airports, seed=0):
+    """Wikidata-shaped bindings (as returned by populate_basic.query_airport) for n_airports airports"""
+
+    rng = random.Random(seed)
+    codes = ["".join(c) for c in product("ABCDEFGHIJKLMNOPQRSTUVWXYZ", repeat=3)]
+    rng.shuffle(codes)
+    if n_airports > len(codes):
+        raise ValueError(f"At most {len(codes)} airports have distinct IATA codes")
+
+    n_countries = max(2, n_airports // 25)
+    n_cities = max(2, n_airports // 2)
+    bindings = []
+    for i in range(n_airports):
+        country = rng.randrange(n_countries)
+        city = rng.randrange(n_cities)
+        row = {
+            "airport": _uri("Q", 1_000_000 + i),
+            "airportLabel": _literal(f"Airport {codes[i]}"),
+            "iata": _literal(codes[i]),
+            "icao": _literal("K" + codes[i]),
+            "coord": _literal(f"Point({rng.uniform(-180, 180):.4f} {rng.uniform(-90, 90):.4f})"),
+            "country": _uri("Q", 10 + country),
+            "countryLabel": _literal(f"Country {country}"),
+            "city": _uri("Q", 100_000 + city),
+            "cityLabel": _literal(f"City {city}"),
+        }
+        runways = rng.randint(0, 3)
+        if not runways:
+            bindings.append(row)
+        for r in range(runways): # The runway OPTIONAL repeats the airport row once per runway
+            runway_row = dict(row)
+            runway_row["runway"] = _uri("Q", 5_000_000 + i * 4 + r)
+            runway_row["runwayLabel"] = _literal(f"Runway {codes[i]}-{r}")
+            if rng.random() < 0.8:
+                runway_row["runwayLength"] = _literal(rng.randint(800, 4500))
+            bindings.append(runway_row)
+    return bindings
+
+def _clock(rng):
+    """A valid HHMM time of day, as in the dep_time and arr_time columns"""
+    return rng.randint(0, 23) * 100 + rng.randint(0, 59)
+
+def synthetic_flights(path, rows, iata_codes, seed=0):
+    """Write rows flights in the flights.csv column layout between the given airports"""
+
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(FLIGHT_COLUMNS)
+        for i in range(rows):
+            carrier, name = rng.choice(AIRLINES)
+            dep = _clock(rng)
+            air_time = rng.randint(20, 720)
+            sched = _clock(rng)
+            writer.writerow([
+                i, 2013, rng.randint(1, 12), rng.randint(1, 28),
+                dep if rng.random() > 0.02 else "", sched, rng.randint(-20, 120),
+                _clock(rng) if rng.random() > 0.02 else "", sched, rng.randint(-40, 120),
+                carrier, rng.randint(1, 6000), f"N{rng.randint(100, 999)}{carrier}",
+                rng.choice(iata_codes), rng.choice(iata_codes),
+                air_time if rng.random() > 0.03 else "", air_time * 8,
+                sched // 100, sched % 100, "2013-01-01 05:00:00", name,
+            ])
+
+class Timer:
+    """Collect (stage, seconds, extra fields) records"""
+
+    def __init__(self):
+        self.stages = []
+
+    def run(self, name, fn, **extra):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        self.stages.append({"stage": name, "seconds": round(elapsed, 6), **extra})
+        print(f"  {name}: {elapsed:.3f}s")
+        return result
+
+def _count(result):
+    return len(result) if result.type == "SELECT" else len(result.graph)
+
+def run_scale(rows, n_airports, workdir, stages, seed=0, batch_size=10000):
+    """Run every selected stage for one scale and return the stage timings"""
+
+    timer = Timer()
+    bindings = synthetic_airports(n_airports, seed)
+    flights_csv = os.path.join(workdir, f"flights_{rows}.csv")
+    synthetic_flights(flights_csv, rows, [b["iata"]["value"] for b in bindings], seed)
+
+    g = Graph()
+    g.parse(os.path.join(HERE, "airports_ontology.rdf"), format="xml")
+    if "basic_ingest" in stages:
+        timer.run("basic_ingest", lambda: populate_basic.populate_ontology(g, bindings), airports=n_airports)
+    else:
+        populate_basic.populate_ontology(g, bindings)
+
+    if "flight_ingest" in stages:
+        timer.run("flight_ingest", lambda: populate_intermediate.stream_ontology(g, flights_csv, batch_size), rows=rows)
+    else:
+        populate_intermediate.stream_ontology(g, flights_csv, batch_size)
+    triples = len(g)
+
+    owl_path = os.path.join(workdir, f"flights_{rows}.owl")
+    if "serialize_xml" in stages or "parse_xml" in stages:
+        timer.run("serialize_xml", lambda: g.serialize(destination=owl_path, format="xml"), triples=triples)
+    if "parse_xml" in stages:
+        timer.run("parse_xml", lambda: Graph().parse(owl_path, format="xml"), triples=triples)
+
+    if "queries" in stages:
+        for ns, uri in (("airport", swrl_reasoner.AIRPORT), ("rdfs", rdflib.RDFS), ("rdf", rdflib.RDF)):
+            g.bind(ns, uri) # Prefixes the predefined queries rely on
+        for prefix, module in (("basic", query_basic), ("intermediate", query_intermediate)):
+            for key, query in module.defined_queries().items():
+                timer.run(f"query:{prefix}:{key}", lambda: _count(g.query(query["query"])))
+
+    if "index" in stages:
+        index = timer.run("index_build", lambda: FlightIndex.from_graph(g), flights=rows)
+        for key in "1234":
+            timer.run(f"index:intermediate:{key}", lambda: index.answer(key))
+
+    if "swrl" in stages:
+        rules, count_rules = swrl_reasoner.load_rules(os.path.join(HERE, "SWRL_rules.txt"))
+        timer.run("swrl", lambda: (swrl_reasoner.run_rules(g, rules, verbose=False),
+                                   swrl_reasoner.run_count_rules(g, count_rules, verbose=False)), triples=triples)
+
+    return {"rows": rows, "airports": n_airports, "triples": triples, "stages": timer.stages}
+
+def environment():
+    """Machine, library and commit details stored with each result"""
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or None,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "rdflib": rdflib.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+def compare(baseline_path, report):
+    """Print the time ratio of each stage against a previous report"""
+
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    before = {(run["rows"], s["stage"]): s["seconds"] for run in baseline["runs"] for s in run["stages"]}
+    print(f"\nCompared with {baseline_path} (commit {baseline['environment'].get('commit')}):")
+    for run in report["runs"]:
+        for s in run["stages"]:
+            old = before.get((run["rows"], s["stage"]))
+            if old:
+                print(f"  {run['rows']:>9} {s['stage']:<24} {old:10.4f}s -> {s['seconds']:10.4f}s  x{s['seconds'] / old:.2f}")
+
+def median_run(runs):
+    """One run with the median seconds of each stage over repeated runs of the same scale"""
+
+    seconds = {}
+    for run in runs:
+        for s in run["stages"]:
+            seconds.setdefault(s["stage"], []).append(s["seconds"])
+    stages = [dict(s, seconds=median(seconds[s["stage"]])) for s in runs[0]["stages"]]
+    return dict(runs[0], stages=stages)
+
+def _duration(seconds):
+    return f"{seconds:.2f}s" if seconds >= 0.1 else f"{seconds * 1000:.2f} ms"
+
+def markdown_table(report):
+    """The stage timings of a report as a Markdown table, one column per scale"""
+
+    runs = report["runs"]
+    stages = list(dict.fromkeys(s["stage"] for run in runs for s in run["stages"]))
+    seconds = {(run["rows"], s["stage"]): s["seconds"] for run in runs for s in run["stages"]}
+    env = report["environment"]
+    lines = [f"Median of {report.get('repeat', 1)} runs with Python {env['python']} and rdflib {env['rdflib']} "
+             f"on {env['cpus']} CPU(s), {runs[0]['airports'] if runs else 0} synthetic airports.", "",
+             "| stage | " + " | ".join(f"{run['rows']:,} rows" for run in runs) + " |",
+             "|---|" + "---:|" * len(runs)]
+    for stage in stages:
+        cells = [_duration(seconds[run["rows"], stage]) if (run["rows"], stage) in seconds else "" for run in runs]
+        lines.append(f"| {stage} | " + " | ".join(cells) + " |")
+    return "\n".join(lines) + "\n"
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, serialization, queries and inference on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000], help="flight rows per scale (10^3 to 10^7)")
+    parser.add_argument("--airports", type=int, default=2000, help="synthetic airports")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES, help="stages to time")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, so runs are reproducible")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows per streaming batch")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scale; each stage reports the median")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON report file")
+    parser.add_argument("--compare", help="previous JSON report to compare stage timings against")
+    parser.add_argument("--markdown", help="also write the stage timings as a Markdown table to this file")
+    parser.add_argument("--keep", help="keep the generated CSV and .owl files in this directory")
+    args = parser.parse_args()
+
+    workdir = args.keep or tempfile.mkdtemp(prefix="airports_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    report = {"environment": environment(), "seed": args.seed, "repeat": args.repeat, "runs": []}
+    try:
+        for rows in args.rows:
+            print(f"Scale: {rows} flights, {args.airports} airports")
+            runs = [run_scale(rows, args.airports, workdir, args.stages, args.seed, args.batch_size) for _ in range(args.repeat)]
+            report["runs"].append(median_run(runs))
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved benchmark results to {args.output}")
+    if args.markdown:
+        with open(args.markdown, "w", encoding="utf-8") as f:
+            f.write(markdown_table(report))
+        print(f"Saved the timings table to {args.markdown}")
+
+    if args.compare:
+        compare(args.compare, report)
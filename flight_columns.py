@@ -0,0 +1,251 @@
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from rdflib import Namespace
+from rdflib.namespace import RDF
+import sidecar
+
+AIRPORT = Namespace("http://www.semanticweb.org/marikaitiprimenta/ontologies/2025/4/airports#")
+
+COLUMNS_VERSION = 3
+
+def clock_minutes(hhmm):
+    """Minutes since midnight for an "HH:MM" string; "24:00" is 1440, so times sort as their strings do"""
+
+    hours, sep, minutes = str(hhmm).partition(":")
+    if not (sep and len(minutes) == 2 and hours.isdigit() and minutes.isdigit()):
+        raise ValueError(f"Not an HH:MM time: {hhmm!r}")
+    hours, minutes = int(hours), int(minutes)
+    if not (hours < 24 and minutes < 60 or (hours, minutes) == (24, 0)):
+        raise ValueError(f"Not an HH:MM time: {hhmm!r}")
+    return hours * 60 + minutes
+
+def to_time(literal):
+    try:
+        return clock_minutes(literal)
+    except ValueError:
+        return None
+
+def to_number(literal):
+    try:
+        return int(float(literal))
+    except ValueError:
+        return None
+
+# column -> (predicate, converter); times are kept as minutes since midnight
+COLUMNS = {
+    "dep_time": (AIRPORT.hasDepartureTime, to_time),
+    "arr_time": (AIRPORT.hasArrivalTime, to_time),
+    "duration": (AIRPORT.hasDuration, to_number),
+    "distance": (AIRPORT.hasDistance, to_number),
+}
+TIME_COLUMNS = {"dep_time", "arr_time"}
+
+def _typecode(values):
+    """Smallest array type that holds every value"""
+
+    low, high = min(values, default=0), max(values, default=0)
+    for code in "BHIQ" if low >= 0 else "bhiq":
+        bound = 1 << (8 * array(code).itemsize - (code.islower()))
+        if -bound <= low and high < bound:
+            return code
+    raise ValueError(f"Values out of range: {low}..{high}")
+
+class Column:
+    """One attribute, dictionary-encoded: the distinct values in order, each with the flights that have it
+
+    The flights with keys[i] are ids[starts[i]:starts[i + 1]], so a range of
+    values is two binary searches over the (small) key array and one slice.
+    """
+
+    def __init__(self, pairs):
+        """Build from (value, flight id) pairs"""
+
+        groups = defaultdict(list)
+        for value, flight_id in pairs:
+            groups[value].append(flight_id)
+        keys = sorted(groups)
+        self.keys = array(_typecode(keys), keys)
+        self.starts = array("L", [0])
+        ids = []
+        for key in keys:
+            ids.extend(sorted(set(groups[key])))
+            self.starts.append(len(ids))
+        self.ids = array(_typecode(ids), ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def span(self, low=None, high=None):
+        """(start, end) positions in ids of the flights with low <= value <= high (None = unbounded)"""
+
+        i = 0 if low is None else bisect_left(self.keys, low)
+        j = len(self.keys) if high is None else bisect_right(self.keys, high)
+        return self.starts[i], self.starts[max(i, j)]
+
+    def between(self, low=None, high=None):
+        """Flight ids with a value in [low, high], in value order"""
+
+        start, end = self.span(low, high)
+        return self.ids[start:end]
+
+    def values_of(self, flight_ids):
+        """Values for each of a set of flight ids (a flight may have several); scans the column, for display"""
+
+        wanted = set(flight_ids)
+        found = defaultdict(list)
+        for i, key in enumerate(self.keys):
+            for flight_id in self.ids[self.starts[i]:self.starts[i + 1]]:
+                if flight_id in wanted:
+                    found[flight_id].append(key)
+        return found
+
+class FlightColumns:
+    """Typed, sorted side store of the numeric and time attributes of the flights"""
+
+    def __init__(self):
+        self.flights = []   # Flight URIs by id
+        self.columns = {}   # name -> Column
+
+    def __getstate__(self):
+        """The flights and, per column, its (keys, starts, ids) arrays"""
+        return {"flights": self.flights,
+                "columns": {name: (c.keys, c.starts, c.ids) for name, c in self.columns.items()}}
+
+    def __setstate__(self, state):
+        self.flights = state["flights"]
+        self.columns = {}
+        for name, (keys, starts, ids) in state["columns"].items():
+            column = self.columns[name] = Column.__new__(Column)
+            column.keys, column.starts, column.ids = keys, starts, ids
+
+    @classmethod
+    def from_graph(cls, g):
+        """Convert each attribute with one pass over its predicate"""
+
+        store = cls()
+        ids = {}
+        for flight in g.subjects(RDF.type, AIRPORT.Flight):
+            if flight not in ids:
+                ids[flight] = len(store.flights)
+                store.flights.append(flight)
+
+        for name, (predicate, convert) in COLUMNS.items():
+            pairs = []
+            for flight, literal in g.subject_objects(predicate):
+                value = convert(literal)
+                if value is not None and flight in ids:
+                    pairs.append((value, ids[flight]))
+            store.columns[name] = Column(pairs)
+        return store
+
+    @staticmethod
+    def _bound(name, value):
+        """A range bound as stored in the column; raises ValueError for a bound that is not a time or number"""
+
+        if value is None:
+            return None
+        if name in TIME_COLUMNS and isinstance(value, str):
+            return clock_minutes(value)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+        raise ValueError(f"Bad {name} bound: {value!r}")
+
+    def ids(self, **ranges):
+        """Flight ids matching every (low, high) range given per column, e.g. distance=(1000, None)
+
+        Time columns also take "HH:MM" bounds. Both bounds are inclusive; a
+        bound that is not a number or time raises ValueError. The
+        narrowest range is read first and the others are intersected with it.
+        """
+
+        spans = []
+        for name, (low, high) in ranges.items():
+            column = self.columns[name]
+            low, high = self._bound(name, low), self._bound(name, high)
+            start, end = column.span(low, high)
+            spans.append((end - start, column, start, end))
+        if not spans:
+            return list(range(len(self.flights)))
+
+        spans.sort(key=lambda span: span[0])
+        _, column, start, end = spans[0]
+        matched = list(dict.fromkeys(column.ids[start:end])) # Value order of the narrowest column
+        for _, column, start, end in spans[1:]:
+            keep = set(column.ids[start:end])
+            matched = [flight_id for flight_id in matched if flight_id in keep]
+        return matched
+
+    def select(self, **ranges):
+        """Flight URIs matching every range (see ids)"""
+        return [self.flights[flight_id] for flight_id in self.ids(**ranges)]
+
+    def morning_flights(self, before="12:00"):
+        """Flights departing before a time, earliest first ("24:00" departures are never morning flights)"""
+        return self.select(dep_time=(None, self._bound("dep_time", before) - 1))
+
+    def long_haul(self, min_distance=3000):
+        """Flights of at least min_distance, shortest first"""
+        return self.select(distance=(min_distance, None))
+
+    def distance_band(self, low, high):
+        """Flights with low <= distance <= high, shortest first"""
+        return self.select(distance=(low, high))
+
+    def size(self):
+        """Bytes taken by the column arrays"""
+        return sum(c.keys.itemsize * len(c.keys) + c.starts.itemsize * len(c.starts) + c.ids.itemsize * len(c.ids)
+                   for c in self.columns.values())
+
+def save_columns(store, path):
+    """Write the column store, gzip-compressed, next to an .owl file or store"""
+    sidecar.save(store, path, ".cols", COLUMNS_VERSION, compress=True)
+
+def load_columns(g, path):
+    """Load the column store for an .owl file or store, rebuilding it when the source is newer"""
+    return sidecar.load_or_build(path, ".cols", COLUMNS_VERSION, FlightColumns, lambda: FlightColumns.from_graph(g), compress=True)
+
+if __name__ == "__main__":
+    import argparse
+    from tabulate import tabulate
+    from snapshot import load_graph
+    from sqlite_store import open_store
+
+    def clock(value):
+        try:
+            clock_minutes(value)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+        return value
+
+    parser = argparse.ArgumentParser(description="Range queries over the flight times, durations and distances")
+    parser.add_argument("--ontology", default="populated_flights.owl", help="ontology file with the flights")
+    parser.add_argument("--store", help="use this persistent SQLite store instead of the ontology file")
+    parser.add_argument("--dep-time", nargs=2, type=clock, metavar=("FROM", "TO"), help="departure time range, HH:MM (inclusive)")
+    parser.add_argument("--arr-time", nargs=2, type=clock, metavar=("FROM", "TO"), help="arrival time range, HH:MM (inclusive)")
+    parser.add_argument("--duration", nargs=2, type=int, metavar=("MIN", "MAX"), help="flight time range in minutes")
+    parser.add_argument("--distance", nargs=2, type=int, metavar=("MIN", "MAX"), help="distance range")
+    parser.add_argument("--limit", type=int, default=30, help="rows to print")
+    args = parser.parse_args()
+
+    g = open_store(args.store) if args.store else load_graph(args.ontology)
+    store = load_columns(g, args.store or args.ontology)
+
+    ranges = {name: tuple(getattr(args, name)) for name in COLUMNS if getattr(args, name)}
+    start = time.perf_counter()
+    ids = store.ids(**ranges)
+    elapsed = time.perf_counter() - start
+
+    shown = ids[:args.limit]
+    values = {name: store.columns[name].values_of(shown) for name in COLUMNS}
+    def show(name, flight_id):
+        found = values[name].get(flight_id, [])
+        if name in TIME_COLUMNS:
+            return ", ".join(f"{v // 60:02d}:{v % 60:02d}" for v in found)
+        return ", ".join(map(str, found))
+
+    if shown:
+        print(tabulate([[store.flights[i].split("#")[-1]] + [show(name, i) for name in COLUMNS] for i in shown],
+                       headers=["flight"] + list(COLUMNS), tablefmt="grid", disable_numparse=True))
+    print(f"{len(ids)} flights in {elapsed * 1000:.2f} ms ({store.size() / (1 << 20):.1f} MB of columns)")
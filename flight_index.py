@@ -0,0 +1,189 @@
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import islice, product
+from rdflib import Namespace, Literal
+from rdflib.namespace import RDF, RDFS
+import sidecar
+
+AIRPORT = Namespace("http://www.semanticweb.org/marikaitiprimenta/ontologies/2025/4/airports#")
+
+INDEX_VERSION = 2
+
+class IndexResult(list):
+    """Rows (dicts keyed by variable name) with the .vars of the equivalent SPARQL result"""
+
+    def __init__(self, variables, rows=()):
+        super().__init__(rows)
+        self.vars = variables
+
+class FlightIndex:
+    """Materialized joins between flights, airports, countries and airlines"""
+
+    def __init__(self):
+        self.flights = []                   # (flight, dep, arr, airlines, dep_times, arr_times)
+        self.routes = defaultdict(list)     # (dep, arr) -> flight positions
+        self.departures = defaultdict(list) # airport -> flight positions
+        self.arrivals = defaultdict(list)
+        self.airports = {}                  # airport -> (labels, IATA codes, countries)
+        self.labels = {}                    # country/airline -> labels
+        self.by_airline = []                # (airline label, dep time, position), sorted
+        self.by_dep_time = []               # (dep time, position), sorted
+        self._dep_time_keys = []            # str(dep time) for each by_dep_time entry
+        self.route_counts = []              # ((dep label, dep IATA, arr label, arr IATA), count), most flights first
+
+    @classmethod
+    def from_graph(cls, g):
+        """Build the indexes with one pass per predicate"""
+
+        index = cls()
+        interned = {}
+        def intern(term):
+            return interned.setdefault(term, term)
+
+        def values(predicate):
+            table = defaultdict(list)
+            for s, o in g.subject_objects(predicate):
+                table[s].append(intern(o))
+            return table
+
+        deps, arrs, operators = values(AIRPORT.hasDepartureAirport), values(AIRPORT.hasArrivalAirport), values(AIRPORT.operatedBy)
+        dep_times, arr_times = values(AIRPORT.hasDepartureTime), values(AIRPORT.hasArrivalTime)
+        labels, iatas, located = values(RDFS.label), values(AIRPORT.hasIATACode), values(AIRPORT.isLocatedIn)
+
+        for flight in g.subjects(RDF.type, AIRPORT.Flight):
+            for dep in deps.get(flight, ()):
+                for arr in arrs.get(flight, ()):
+                    position = len(index.flights)
+                    index.flights.append((flight, dep, arr, tuple(operators.get(flight, ())),
+                                          tuple(dep_times.get(flight, ())), tuple(arr_times.get(flight, ()))))
+                    index.routes[dep, arr].append(position)
+                    index.departures[dep].append(position)
+                    index.arrivals[arr].append(position)
+
+        for airport in set(index.departures) | set(index.arrivals):
+            index.airports[airport] = (tuple(labels.get(airport, ())), tuple(iatas.get(airport, ())), tuple(located.get(airport, ())))
+            for country in located.get(airport, ()):
+                index.labels[country] = tuple(labels.get(country, ()))
+        for record in index.flights:
+            for airline in record[3]:
+                index.labels[airline] = tuple(labels.get(airline, ()))
+
+        index._sort()
+        return index
+
+    def _sort(self):
+        """Precompute the orderings used by the predefined queries"""
+
+        by_airline = []
+        by_dep_time = []
+        for position, (_, _, _, airlines, dep_times, _) in enumerate(self.flights):
+            for airline in airlines:
+                for label in self.labels.get(airline, ()):
+                    for dep_time in dep_times or (None,):
+                        by_airline.append((str(label), dep_time is not None, str(dep_time or ""), label, dep_time, position))
+            for dep_time in dep_times:
+                by_dep_time.append((str(dep_time), dep_time, position))
+        by_airline.sort(key=lambda entry: entry[:3]) # Unbound departure times sort first, as in SPARQL
+        by_dep_time.sort(key=lambda entry: entry[0])
+        self.by_airline = [entry[3:] for entry in by_airline]
+        self.by_dep_time = [entry[1:] for entry in by_dep_time]
+        self._dep_time_keys = [entry[0] for entry in by_dep_time]
+
+        counts = defaultdict(int)
+        for (dep, arr), positions in self.routes.items():
+            dep_labels, dep_iatas, _ = self.airports[dep]
+            arr_labels, arr_iatas, _ = self.airports[arr]
+            for key in product(dep_labels, dep_iatas, arr_labels, arr_iatas):
+                counts[key] += len(positions)
+        self.route_counts = sorted(counts.items(), key=lambda item: -item[1])
+
+    def country_labels(self, airport):
+        """(country, label) pairs for an airport"""
+        return [(country, label) for country in self.airports.get(airport, ((), (), ()))[2] for label in self.labels.get(country, ())]
+
+    def airport_by_iata(self, code):
+        """Airport URI for an IATA code, or None"""
+
+        for airport, (_, iatas, _) in self.airports.items():
+            if any(str(iata) == code for iata in iatas):
+                return airport
+        return None
+
+    def route(self, dep, arr):
+        """Flight URIs between two airports"""
+        return [self.flights[position][0] for position in self.routes.get((dep, arr), ())]
+
+    def flights_from(self, airport):
+        """Flight URIs departing from an airport"""
+        return [self.flights[position][0] for position in self.departures.get(airport, ())]
+
+    def flights_to(self, airport):
+        """Flight URIs arriving at an airport"""
+        return [self.flights[position][0] for position in self.arrivals.get(airport, ())]
+
+    def _airport_rows(self, airport, with_iata=False, with_country=False):
+        labels, iatas, _ = self.airports[airport]
+        countries = [label for _, label in self.country_labels(airport)] if with_country else [None]
+        return product(labels, iatas if with_iata else [None], countries)
+
+    def flight_details(self, limit=30):
+        """Query 1: flights with departure and arrival details"""
+
+        variables = ["flight", "depAirportLabel", "depIATA", "arrAirportLabel", "arrIATA", "airline", "depTime", "arrTime"]
+        rows = IndexResult(variables)
+        for flight, dep, arr, airlines, dep_times, arr_times in self.flights:
+            for dep_label, dep_iata, _ in self._airport_rows(dep, with_iata=True):
+                for arr_label, arr_iata, _ in self._airport_rows(arr, with_iata=True):
+                    for airline, dep_time, arr_time in product(airlines, dep_times or (None,), arr_times or (None,)):
+                        rows.append(dict(zip(variables, (flight, dep_label, dep_iata, arr_label, arr_iata, airline, dep_time, arr_time))))
+                        if len(rows) >= limit:
+                            return rows
+        return rows
+
+    def _route_rows(self, entries, variables, limit):
+        """Expand (position, leading values, trailing values) entries with airport and country labels"""
+
+        rows = IndexResult(variables)
+        for position, lead, tail in entries:
+            _, dep, arr, _, _, _ = self.flights[position]
+            for dep_label, _, dep_country in self._airport_rows(dep, with_country=True):
+                for arr_label, _, arr_country in self._airport_rows(arr, with_country=True):
+                    rows.append(dict(zip(variables, lead + (dep_label, dep_country, arr_label, arr_country) + tail)))
+                    if len(rows) >= limit:
+                        return rows
+        return rows
+
+    def flights_by_airline(self, limit=30):
+        """Query 2: flights ordered by airline label and departure time"""
+
+        variables = ["airlineLabel", "depAirportLabel", "depCountryLabel", "arrAirportLabel", "arrCountryLabel", "depTime"]
+        entries = ((position, (label,), (dep_time,)) for label, dep_time, position in self.by_airline)
+        return self._route_rows(entries, variables, limit)
+
+    def morning_flights(self, before="12:00", limit=30):
+        """Query 3: flights departing before a time, earliest first"""
+
+        variables = ["flight", "depTime", "depAirportLabel", "depCountryLabel", "arrAirportLabel", "arrCountryLabel"]
+        end = bisect_left(self._dep_time_keys, before) # Departure times sorted as strings, so the filter is a prefix
+        entries = ((position, (self.flights[position][0], dep_time), ()) for dep_time, position in islice(self.by_dep_time, end))
+        return self._route_rows(entries, variables, limit)
+
+    def busiest_routes(self, limit=30):
+        """Query 4: airport pairs with the most flights"""
+
+        variables = ["depAirportLabel", "depIATA", "arrAirportLabel", "arrIATA", "flightCount"]
+        return IndexResult(variables, [dict(zip(variables, key + (Literal(count),))) for key, count in self.route_counts[:limit]])
+
+    def answer(self, key):
+        """Answer a predefined query of query_intermediate.py by its menu key"""
+
+        return {"1": self.flight_details, "2": self.flights_by_airline,
+                "3": self.morning_flights, "4": self.busiest_routes}[key]()
+
+def save_index(index, path):
+    """Write the index next to an .owl file or store"""
+    sidecar.save(index, path, ".idx", INDEX_VERSION)
+
+def load_index(g, path):
+    """Load the index for an .owl file or store, rebuilding it when the source is newer"""
+    return sidecar.load_or_build(path, ".idx", INDEX_VERSION, FlightIndex, lambda: FlightIndex.from_graph(g))
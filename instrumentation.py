@@ -0,0 +1,138 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from tabulate import tabulate
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None where it cannot be read)"""
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1) # bytes on macOS, KB on Linux
+
+class Instrumentation:
+    """Per-stage timers and counters, with optional cProfile and tracemalloc captures"""
+
+    def __init__(self):
+        self.stages = []
+        self.counters = {}  # Counts made outside any stage
+        self.current = None
+        self.profile = False
+        self.profile_dir = "profiles"
+        self.trace_memory = False
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()  # Counts also come from fetch threads
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage; counts made inside it are attached to it"""
+
+        record = {"stage": name, "seconds": 0.0, "counters": {}}
+        parent, self.current = self.current, record
+        profiler = cProfile.Profile() if self.profile and parent is None else None # cProfile cannot nest
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif self.trace_memory:
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler:
+                profiler.disable()
+            record["seconds"] = round(time.perf_counter() - start, 6)
+            record["peak_rss_mb"] = peak_rss_mb()
+            if self.trace_memory:
+                record["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 1)
+                top = tracemalloc.take_snapshot().statistics("lineno")[:5]
+                record["top_allocations"] = [f"{stat.traceback[0]}: {stat.size / (1 << 20):.1f} MB" for stat in top]
+                if tracing:
+                    tracemalloc.stop()
+            if profiler:
+                record["profile"] = self._save_profile(name, profiler)
+            self.current = parent
+            self.stages.append(record)
+
+    def _save_profile(self, name, profiler):
+        """Dump the stage's profile and return its path and the ten most expensive calls"""
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{name.replace(':', '_').replace(' ', '_')}.prof")
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(10)
+        return {"path": path, "top": [line.strip() for line in out.getvalue().splitlines() if line.strip()][-10:]}
+
+    def count(self, name, n=1):
+        """Add n to a counter of the current stage"""
+
+        with self.lock:
+            counters = self.current["counters"] if self.current else self.counters
+            counters[name] = counters.get(name, 0) + n
+
+    def counter(self, name):
+        """Current value of a counter, summed over all stages"""
+        return self.counters.get(name, 0) + sum(s["counters"].get(name, 0) for s in self.stages) + \
+            (self.current["counters"].get(name, 0) if self.current else 0)
+
+    def report(self):
+        return {
+            "argv": sys.argv,
+            "seconds": round(time.perf_counter() - self.started, 6),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": self.stages,
+            "counters": self.counters,
+        }
+
+    def summary(self):
+        """Table of the stages with their time, peak RSS and counters"""
+
+        rows = [[s["stage"], f"{s['seconds']:.3f}", s["peak_rss_mb"],
+                 ", ".join(f"{k}={v}" for k, v in s["counters"].items())] for s in self.stages]
+        if self.counters:
+            rows.append(["(other)", "", "", ", ".join(f"{k}={v}" for k, v in self.counters.items())])
+        return tabulate(rows, headers=["stage", "seconds", "peak RSS (MB)", "counters"], tablefmt="simple", disable_numparse=True)
+
+    def export(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+metrics = Instrumentation()  # Shared by the scripts of one run
+
+def add_arguments(parser):
+    """Command line flags for the instrumentation"""
+
+    parser.add_argument("--profile", action="store_true", help="capture a cProfile of each stage (saved under --profile-dir)")
+    parser.add_argument("--profile-dir", default="profiles", help="directory for the per-stage .prof files")
+    parser.add_argument("--trace-memory", action="store_true", help="trace Python allocations of each stage with tracemalloc")
+    parser.add_argument("--metrics", help="also write the run report as JSON to this file")
+
+def configure(args):
+    metrics.profile = args.profile
+    metrics.profile_dir = args.profile_dir
+    metrics.trace_memory = args.trace_memory
+
+def finish(args):
+    """Print the run summary and export it when requested"""
+
+    print("\n" + metrics.summary())
+    if args.metrics:
+        metrics.export(args.metrics)
+        print(f"Saved run metrics to {args.metrics}")
@@ -1,19 +1,28 @@
-from rdflib import Graph, Namespace, Literal, URIRef, XSD
+from rdflib import Graph, Namespace, XSD
 from rdflib.namespace import RDF, RDFS, OWL
 from SPARQLWrapper import SPARQLWrapper, JSON
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
 import re
+import time
+from rdf_output import FORMATS
+from snapshot import save_graph
+from spatial_index import SpatialIndex, save_spatial
+from instrumentation import metrics, add_arguments, configure, finish
+from term_cache import terms, count_terms
+import term_cache
+from sqlite_store import open_store, insert_count
 
 # Define namespaces
 AIRPORT = Namespace("http://www.semanticweb.org/marikaitiprimenta/ontologies/2025/4/airports#")
 WD = Namespace("http://www.wikidata.org/entity/")
 WDT = Namespace("http://www.wikidata.org/prop/direct/")
-    
-def query_airport():
-    """Get airport data from Wikidata"""
 
-    sparql = SPARQLWrapper("https://query.wikidata.org/sparql")
-   
-    query = """
+WIKIDATA_ENDPOINT = "https://query.wikidata.org/sparql"
+
+AIRPORT_QUERY = """
 
     SELECT ?airport ?airportLabel ?iata ?icao ?city ?cityLabel ?country ?countryLabel ?coord ?runway ?runwayLabel ?runwayLength
         WHERE {
@@ -36,6 +45,14 @@ def query_airport():
                 ?runway rdfs:label ?runwayLabel .
             }
         }
+"""
+    
+def query_airport():
+    """Get airport data from Wikidata"""
+
+    sparql = SPARQLWrapper(WIKIDATA_ENDPOINT)
+   
+    query = AIRPORT_QUERY + """
     LIMIT 800
     """
     
@@ -43,129 +60,278 @@ def query_airport():
     sparql.setReturnFormat(JSON)
 
     results = sparql.query().convert()
+    metrics.count("rows_fetched", len(results['results']['bindings']))
     
     print(f"Retrieved {len(results['results']['bindings'])} airports")
     return results['results']['bindings']
 
 
+def fetch_page(endpoint, offset, page_size, retries=5, backoff=2.0):
+    """Fetch one page of airport bindings, retrying with exponential backoff"""
+
+    sparql = SPARQLWrapper(endpoint, agent="AirportsOntology/1.0 (populate_basic.py)")
+    sparql.setQuery(AIRPORT_QUERY + f"""
+    ORDER BY ?airport ?runway ?iata ?icao ?country ?city ?coord ?runwayLength
+    LIMIT {page_size}
+    OFFSET {offset}
+    """)
+    sparql.setReturnFormat(JSON)
+
+    for attempt in range(retries):
+        try:
+            return sparql.query().convert()
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            delay = backoff * 2 ** attempt
+            metrics.count("fetch_retries")
+            print(f"Page at offset {offset} failed ({e}), retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+def _cached_page(path, ttl):
+    """Return a cached page if it exists and is younger than ttl seconds (ttl None = never expires)"""
+
+    if not os.path.exists(path):
+        return None
+    if ttl is not None and time.time() - os.path.getmtime(path) > ttl:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _get_page(endpoint, offset, page_size, cache_dir, ttl, offline):
+    path = os.path.join(cache_dir, f"page_{offset:08d}.json")
+    page = _cached_page(path, None if offline else ttl)
+    if page is not None or offline:
+        metrics.count("pages_cached" if page is not None else "pages_missing")
+        return page
+
+    page = fetch_page(endpoint, offset, page_size)
+    metrics.count("pages_fetched")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(page, f)
+    os.replace(tmp_path, path)  # a page is only cached once it is complete
+    return page
+
+def fetch_airports(endpoint=WIKIDATA_ENDPOINT, page_size=5000, workers=4, cache_dir=".wikidata_cache", ttl=24 * 3600, fixtures=None):
+    """Get all airport data from Wikidata, page by page
+
+    Pages (ORDER BY + LIMIT/OFFSET) are requested `workers` at a time and the
+    raw JSON of each page is cached on disk, so a rerun within the TTL, or
+    after a failure, only fetches the pages that are missing. With `fixtures`
+    the pages are read from that directory of recorded page_<offset>.json
+    files and no request is made; `endpoint` can also point at a local SPARQL
+    server.
+    """
+
+    offline = fixtures is not None
+    if offline:
+        cache_dir = fixtures
+    else:
+        key = hashlib.sha1(f"{endpoint}\n{AIRPORT_QUERY}\n{page_size}".encode("utf-8")).hexdigest()[:12]
+        cache_dir = os.path.join(cache_dir, key)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    bindings = []
+    offset = 0
+    with ThreadPoolExecutor(workers) as pool:
+        while True:
+            offsets = [offset + i * page_size for i in range(workers)]
+            pages = pool.map(lambda o: _get_page(endpoint, o, page_size, cache_dir, ttl, offline), offsets)
+
+            last_page = False
+            for page in pages: # Pages are consumed in offset order
+                rows = page["results"]["bindings"] if page else []
+                bindings.extend(rows)
+                if len(rows) < page_size:
+                    last_page = True
+                    break
+
+            if last_page:
+                break
+            offset = offsets[-1] + page_size
+
+    metrics.count("rows_fetched", len(bindings))
+    print(f"Retrieved {len(bindings)} airport bindings")
+    return bindings
+
+def _entity_id(uri):
+    return uri.split('/')[-1]
+
+def aggregate_airports(airport_data):
+    """Group the query bindings into one record per country, city, runway and airport
+
+    The runway OPTIONAL (and multi-valued properties) repeat each airport over
+    many rows; each record keeps every distinct value in first-seen order so the
+    triples can be emitted once. Countries, cities and runways keep the values
+    of the first row that mentions them.
+    """
+
+    countries = {}
+    cities = {}
+    runways = {}
+    airports = {}
+    skipped = 0
+
+    for row in airport_data:
+        country_id = None
+        if 'country' in row:
+            country_uri = row['country']['value']
+            country_id = _entity_id(country_uri)
+            if country_id not in countries:
+                countries[country_id] = (country_uri, row['countryLabel']['value'])
+
+        city_id = None
+        if 'city' in row:
+            city_uri = row['city']['value']
+            city_id = _entity_id(city_uri)
+            if city_id not in cities:
+                cities[city_id] = (city_uri, row['cityLabel']['value'], country_id)
+
+        if 'airport' not in row or 'airportLabel' not in row:
+            skipped += 1
+            continue
+
+        airport_uri = row['airport']['value']
+        record = airports.get(_entity_id(airport_uri))
+        if record is None:
+            record = airports[_entity_id(airport_uri)] = {
+                'uris': {}, 'labels': {}, 'iata': {}, 'icao': {}, 'coords': {},
+                'runways': {}, 'countries': {}, 'cities': {},
+            }
+
+        # dicts are used as insertion-ordered sets
+        record['uris'][airport_uri] = None
+        record['labels'][row['airportLabel']['value']] = None
+        if 'iata' in row:
+            record['iata'][row['iata']['value']] = None
+        if 'icao' in row:
+            record['icao'][row['icao']['value']] = None
+        if 'coord' in row:
+            record['coords'][row['coord']['value']] = None
+        if country_id is not None:
+            record['countries'][country_id] = None
+        if city_id is not None:
+            record['cities'][city_id] = None
+
+        if 'runway' in row:
+            runway_id = _entity_id(row['runway']['value'])
+            record['runways'][runway_id] = None
+            if runway_id not in runways:
+                runways[runway_id] = (
+                    row['runwayLabel']['value'] if 'runwayLabel' in row else None,
+                    row['runwayLength']['value'] if 'runwayLength' in row else None,
+                )
+
+    return countries, cities, runways, airports, skipped
+
 def populate_ontology(g, airport_data):
     """Populate the ontology with airport data"""
 
+    countries, cities, runways, airports, skipped = aggregate_airports(airport_data)
+    if skipped:
+        print(f"Skipping {skipped} airport rows with missing data")
+    triples_before = insert_count(g)
+
+    # Create all country entities
     country_map = {}
+    for country_id, (country_uri, country_label) in countries.items():
+        country_entity = AIRPORT[f"Country_{country_id}"]
+        country_map[country_id] = country_entity
+
+        g.add((country_entity, RDF.type, AIRPORT.Country))  # Add to ontology
+        g.add((country_entity, RDFS.label, terms.literal(country_label, lang="en")))
+        g.add((country_entity, OWL.sameAs, terms.uri(country_uri)))
+        g.add((country_entity, AIRPORT.hasName, terms.literal(country_label, XSD.string)))
+
+    # Create all city entities
     city_map = {}
+    for city_id, (city_uri, city_label, country_id) in cities.items():
+        city_entity = AIRPORT[f"City_{city_id}"]
+        city_map[city_id] = city_entity
+
+        g.add((city_entity, RDF.type, AIRPORT.City))    # Add to ontology
+        g.add((city_entity, RDFS.label, terms.literal(city_label, lang="en")))
+        g.add((city_entity, OWL.sameAs, terms.uri(city_uri)))
+
+        if country_id is not None:        # Link city to country
+            g.add((city_entity, AIRPORT.isLocatedIn, country_map[country_id]))
+
+    # Create all runway entities
     runway_map = {}
-    
-    for airport in airport_data:
-
-        # Create all country entities 
-        if 'country' in airport:
-            country_uri = airport['country']['value']
-            country_label = airport['countryLabel']['value']
-            country_id = country_uri.split('/')[-1]
-            
-            if country_id not in country_map:  # check if country already exists
-                country_entity = AIRPORT[f"Country_{country_id}"]
-                country_map[country_id] = country_entity
-                
-                g.add((country_entity, RDF.type, AIRPORT.Country))  # Add to ontology
-                g.add((country_entity, RDFS.label, Literal(country_label, lang="en")))
-                g.add((country_entity, OWL.sameAs, URIRef(country_uri)))
-                g.add((country_entity, AIRPORT.hasName, Literal(country_label, datatype=XSD.string)))
-                
-    for airport in airport_data:
-    
-        # Create all city entities
-        if 'city' in airport:
-            city_uri = airport['city']['value']
-            city_label = airport['cityLabel']['value']
-            city_id = city_uri.split('/')[-1]
-            
-            if city_id not in city_map:  # check if city already exists
-                city_entity = AIRPORT[f"City_{city_id}"]
-                city_map[city_id] = city_entity
-                
-                g.add((city_entity, RDF.type, AIRPORT.City))    # Add to ontology
-                g.add((city_entity, RDFS.label, Literal(city_label, lang="en")))
-                g.add((city_entity, OWL.sameAs, URIRef(city_uri)))
-                
-                if 'country' in airport:        # Link city to country
-                    country_id = airport['country']['value'].split('/')[-1]
-                    if country_id in country_map:
-                        g.add((city_entity, AIRPORT.isLocatedIn, country_map[country_id]))
-
-    for airport in airport_data:
-
-        # Create all airport entities
-        if 'airport' not in airport or 'airportLabel' not in airport:
-            print("Skipping airport with missing data")
-            continue
-            
-        airport_uri = airport['airport']['value']
-        airport_id = airport_uri.split('/')[-1]
+    for runway_id, (runway_label, runway_length) in runways.items():
+        runway_sanitized = re.sub(r'\W+', '_', runway_id.strip())
+        runway_entity = AIRPORT[f"Runway_{runway_sanitized}"]
+        runway_map[runway_id] = runway_entity
+
+        g.add((runway_entity, RDF.type, AIRPORT.Runway))
+
+        if runway_label is not None:
+            g.add((runway_entity, RDFS.label, terms.literal(runway_label, lang="en")))
+
+        if runway_length is not None:  # Add runway length
+            g.add((runway_entity, AIRPORT.hasRunwayLen, terms.literal(runway_length, XSD.decimal)))
+
+    # Create all airport entities
+    for airport_id, record in airports.items():
         airport_entity = AIRPORT[f"Airport_{airport_id}"]
-        airport_label = airport['airportLabel']['value']
-        
-        g.add((airport_entity, RDF.type, AIRPORT.Airport)) # Add to ontology 
-        g.add((airport_entity, RDFS.label, Literal(airport_label, lang="en")))
-        g.add((airport_entity, OWL.sameAs, URIRef(airport_uri)))
-        
-        if 'iata' in airport:   # Add IATA code
-            iata_code = airport['iata']['value']
-            g.add((airport_entity, AIRPORT.hasIATACode, Literal(iata_code, datatype=XSD.string)))
-        
-        if 'icao' in airport:  # Add ICAO code 
-            icao_code = airport['icao']['value']
-            g.add((airport_entity, AIRPORT.hasICAOCode, Literal(icao_code, datatype=XSD.string)))
-        
-        if 'coord' in airport: # Add coordinates 
-            coord_value = airport['coord']['value']
-            g.add((airport_entity, AIRPORT.hasCoordinates, Literal(coord_value, datatype=XSD.string)))
-        
-        if 'runway' in airport: # Process runway information
-            runway_uri = airport['runway']['value']
-            runway_id = runway_uri.split('/')[-1]
-            
-            # Create runway entity
-            if runway_id not in runway_map:
-
-                runway_sanitized = re.sub(r'\W+', '_', runway_id.strip())
-                runway_entity = AIRPORT[f"Runway_{runway_sanitized}"]
-                runway_map[runway_id] = runway_entity
-                
-                g.add((runway_entity, RDF.type, AIRPORT.Runway))
-                
-                if 'runwayLabel' in airport:
-                    runway_label = airport['runwayLabel']['value']
-                    g.add((runway_entity, RDFS.label, Literal(runway_label, lang="en")))
-                
-                if 'runwayLength' in airport:  # Add runway length
-                    runway_length = airport['runwayLength']['value']
-                    g.add((runway_entity, AIRPORT.hasRunwayLen, Literal(runway_length, datatype=XSD.decimal)))
-            
-            runway_entity = runway_map[runway_id]    # Link airport to runway
-            g.add((airport_entity, AIRPORT.hasRunway, runway_entity))
-         
-        if 'country' in airport: # Link airport to country
-            country_id = airport['country']['value']
-            country_id = country_id.split('/')[-1]
-
-            if country_id in country_map:  # Check if country exists in map
-                country_entity = country_map[country_id]
-                g.add((airport_entity, AIRPORT.isLocatedIn, country_entity))
-        
-        if 'city' in airport: # Link airport to city
-            city_id = airport['city']['value']
-            city_id = city_id.split('/')[-1]
-            if city_id in city_map:  # Check if city exists in map
-                city_entity = city_map[city_id]
-                g.add((airport_entity, AIRPORT.servesCity, city_entity))
-    
+
+        g.add((airport_entity, RDF.type, AIRPORT.Airport)) # Add to ontology
+        for airport_label in record['labels']:
+            g.add((airport_entity, RDFS.label, terms.literal(airport_label, lang="en")))
+        for airport_uri in record['uris']:
+            g.add((airport_entity, OWL.sameAs, terms.uri(airport_uri)))
+
+        for iata_code in record['iata']:   # Add IATA code
+            g.add((airport_entity, AIRPORT.hasIATACode, terms.literal(iata_code, XSD.string)))
+
+        for icao_code in record['icao']:  # Add ICAO code
+            g.add((airport_entity, AIRPORT.hasICAOCode, terms.literal(icao_code, XSD.string)))
+
+        for coord_value in record['coords']: # Add coordinates
+            g.add((airport_entity, AIRPORT.hasCoordinates, terms.literal(coord_value, XSD.string)))
+
+        for runway_id in record['runways']:    # Link airport to runway
+            g.add((airport_entity, AIRPORT.hasRunway, runway_map[runway_id]))
+
+        for country_id in record['countries']: # Link airport to country
+            g.add((airport_entity, AIRPORT.isLocatedIn, country_map[country_id]))
+
+        for city_id in record['cities']: # Link airport to city
+            g.add((airport_entity, AIRPORT.servesCity, city_map[city_id]))
+
+    metrics.count("rows_read", len(airport_data))
+    metrics.count("rows_skipped", skipped)
+    metrics.count("airports", len(airports))
+    metrics.count("triples_added", insert_count(g) - triples_before)
     return g
 
 if __name__ == "__main__":
-    
-    g = Graph()
-    g.parse("airports_ontology.rdf", format="xml") # Load the base ontology
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Populate the airport ontology from Wikidata")
+    parser.add_argument("--all", action="store_true", help="page through every airport instead of the first 800 rows")
+    parser.add_argument("--endpoint", default=WIKIDATA_ENDPOINT, help="SPARQL endpoint used with --all")
+    parser.add_argument("--page-size", type=int, default=5000, help="rows per page with --all")
+    parser.add_argument("--workers", type=int, default=4, help="pages fetched concurrently with --all")
+    parser.add_argument("--cache-dir", default=".wikidata_cache", help="where raw pages are cached with --all")
+    parser.add_argument("--ttl", type=float, default=24, help="hours before a cached page is fetched again")
+    parser.add_argument("--fixtures", help="read recorded pages from this directory instead of the endpoint")
+    parser.add_argument("--store", help="append into this persistent SQLite store instead of rewriting the .owl file")
+    parser.add_argument("--format", default="xml", choices=FORMATS,
+                        help="output format; xml (RDF/XML) opens in Protégé, the others are streamed and much faster")
+    add_arguments(parser)
+    term_cache.add_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+    term_cache.configure(args)
+
+    with metrics.stage("load"):
+        if args.store:
+            g = open_store(args.store, seed="airports_ontology.rdf") # Base ontology is loaded only into a new store
+        else:
+            g = Graph()
+            g.parse("airports_ontology.rdf", format="xml") # Load the base ontology
     
     g.bind("airport", AIRPORT)
     g.bind("wd", WD)
@@ -173,8 +339,25 @@ if __name__ == "__main__":
     
     print(f"Loaded ontology with {len(g)} triples")
     
-    airport_data = query_airport() # Query airport data from Wikidata
-    g = populate_ontology(g, airport_data) # Populate the ontology
+    with metrics.stage("fetch"):
+        if args.all or args.fixtures:
+            airport_data = fetch_airports(args.endpoint, args.page_size, args.workers,
+                                          args.cache_dir, args.ttl * 3600, args.fixtures)
+        else:
+            airport_data = query_airport() # Query airport data from Wikidata
+    with metrics.stage("populate"):
+        g = populate_ontology(g, airport_data) # Populate the ontology
+        count_terms()
+    with metrics.stage("spatial"):
+        spatial = SpatialIndex.from_graph(g) # Parsed coordinates for spatial_index.py
     
-    g.serialize(destination="populated_airports.owl", format="xml") # Save the populated ontology
-    print(f"Saved populated ontology to populated_airports.owl")
\ No newline at end of file
+    with metrics.stage("save"):
+        if args.store:
+            g.close()
+            print(f"Saved populated ontology to {args.store}")
+        else:
+            path = save_graph(g, "populated_airports.owl", args.format) # Save the populated ontology and its snapshot
+            print(f"Saved populated ontology to {path}")
+        save_spatial(spatial, args.store or "populated_airports.owl") # Written last so it is newer than the ontology
+    print(f"Saved spatial index with the coordinates of {len(spatial)} airports")
+    finish(args)
\ No newline at end of file
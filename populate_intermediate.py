@@ -1,9 +1,31 @@
 import csv
-from rdflib import Graph, Namespace, Literal, URIRef, XSD
-from rdflib.namespace import RDF, RDFS
+import io
+import os
 import re
+import sys
+import time
+from array import array
+from functools import lru_cache
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from rdflib import Graph, Namespace, URIRef, XSD
+from rdflib.namespace import RDF, RDFS
+from rdflib.plugins.serializers.nt import _nt_row
+from rdf_output import FORMATS
+from snapshot import load_graph, save_graph
+from flight_index import FlightIndex, save_index
+from flight_columns import FlightColumns, save_columns
+from instrumentation import metrics, add_arguments, configure, finish
+from term_cache import terms, count_terms
+import term_cache
+from sqlite_store import open_store, insert_count
 
 AIRPORT = Namespace("http://www.semanticweb.org/marikaitiprimenta/ontologies/2025/4/airports#")
+FLIGHTS_GRAPH = URIRef(AIRPORT + "flights")  # graph name used for N-Quads output
+FLIGHT_WINDOW = 100000  # Recent flights whose sink lines are remembered to drop repeats
+CHUNK_BYTES = 4 << 20   # CSV bytes converted per worker task
 
 def format_time(time_value): # Helper function to convert time values
     if not time_value or time_value == "":
@@ -16,14 +38,158 @@ def format_time(time_value): # Helper function to convert time values
         return f"{time_str[:2]}:{time_str[2:]}"
     return None
 
-def populate_ontology(g):
-    """Populate the ontology with flight data"""
-
+def build_iata_map(g):
+    """Build a map of IATA code → Airport URI"""
     iata_map = {}
-    for s, _, o in g.triples((None, AIRPORT.hasIATACode, None)): # Build a map of IATA code → Airport URI
+    for s, _, o in g.triples((None, AIRPORT.hasIATACode, None)):
         iata_map[str(o)] = s
+    return iata_map
+
+def make_flight_uri(src_iata, dst_iata, airline_sanitized, flight_number):
+    """Flight subject URI, the key used to add, replace or retract a flight"""
+    return terms.uri(AIRPORT + f"Flight_{src_iata}_{dst_iata}_{airline_sanitized}_{flight_number}")
+
+def flight_triples(row, iata_map, airlines_map):
+    """Convert one CSV row to its flight (and new airline) triples"""
+
+    src_iata = row[13]
+    dst_iata = row[14]
+
+    if src_iata not in iata_map or dst_iata not in iata_map: # Match IATA codes to Aiports
+        metrics.count("rows_skipped_iata")
+        return []
+
+    airline = row[20]
+    flight_number = row[11]
+    depart_time = format_time(row[4])
+    arrival_time = format_time(row[7])
+    air_time = row[15]
+    distance = row[16]
+
+    airline_sanitized = re.sub(r'\W+', '_', airline.strip())
+
+    # Add Flight
+    flight_uri = make_flight_uri(src_iata, dst_iata, airline_sanitized, flight_number)
+    triples = [
+        (flight_uri, RDF.type, AIRPORT.Flight),
+        (flight_uri, AIRPORT.hasDepartureAirport, iata_map[src_iata]),
+        (flight_uri, AIRPORT.hasArrivalAirport, iata_map[dst_iata]),
+        (flight_uri, AIRPORT.operatedBy, terms.literal(airline)),
+    ]
+
+    # Add Airline
+    if airline not in airlines_map:
+        airline_uri = AIRPORT[f"Airline_{airline_sanitized}"]
+        triples.append((airline_uri, RDF.type, AIRPORT.Airline))
+        triples.append((airline_uri, RDFS.label, terms.literal(airline, lang="en")))
+        airlines_map[airline] = airline_uri
+
+    triples.append((flight_uri, AIRPORT.operatedBy, airlines_map[airline]))
+
+    if flight_number:
+        triples.append((flight_uri, AIRPORT.hasFlightNumber, terms.literal(flight_number, XSD.integer)))
+
+    if depart_time:
+        triples.append((flight_uri, AIRPORT.hasDepartureTime, terms.literal(depart_time, XSD.string)))
+
+    if arrival_time:
+        triples.append((flight_uri, AIRPORT.hasArrivalTime, terms.literal(arrival_time, XSD.string)))
+
+    if air_time and air_time.strip():
+        duration_minutes = int(float(air_time))
+        triples.append((flight_uri, AIRPORT.hasDuration, terms.literal(duration_minutes, XSD.integer)))
+
+    if distance and distance.strip():
+        triples.append((flight_uri, AIRPORT.hasDistance, terms.literal(distance, XSD.integer)))
+
+    return triples
+
+@lru_cache(maxsize=None)
+def _hhmm(time_value):
+    return format_time(time_value)
+
+@lru_cache(maxsize=None)
+def _sanitize(airline):
+    return re.sub(r'\W+', '_', airline.strip())
+
+@lru_cache(maxsize=None)
+def _duration(air_time):
+    if air_time and air_time.strip():
+        return int(float(air_time))
+    return None
+
+def convert_batch(batch, iata_map, airlines_map):
+    """Columnar version of flight_triples for a whole batch of CSV rows
 
+    Each column is converted in one pass over its values (times, durations,
+    sanitized airline names are computed once per distinct value and terms
+    come from the shared term cache),
+    then the triples are emitted in the same order flight_triples would give.
+    """
+
+    src = list(map(itemgetter(13), batch))
+    dst = list(map(itemgetter(14), batch))
+    keep = [i for i, (s, d) in enumerate(zip(src, dst)) if s in iata_map and d in iata_map]
+    metrics.count("rows_skipped_iata", len(batch) - len(keep))
+    if not keep:
+        return []
+
+    pick = itemgetter(*keep) if len(keep) > 1 else lambda column: (column[keep[0]],)
+    rows = pick(batch)
+    src = pick(src)
+    dst = pick(dst)
+    airlines = list(map(itemgetter(20), rows))
+    numbers = list(map(itemgetter(11), rows))
+    sanitized = list(map(_sanitize, airlines))
+    dep_times = list(map(_hhmm, map(itemgetter(4), rows)))
+    arr_times = list(map(_hhmm, map(itemgetter(7), rows)))
+    durations = list(map(_duration, map(itemgetter(15), rows)))
+    distances = list(map(itemgetter(16), rows))
+    flight_uris = list(map(make_flight_uri, src, dst, sanitized, numbers))
+
+    flight_type = AIRPORT.Flight
+    has_dep, has_arr = AIRPORT.hasDepartureAirport, AIRPORT.hasArrivalAirport
+    operated_by = AIRPORT.operatedBy
+    has_number, has_dep_time = AIRPORT.hasFlightNumber, AIRPORT.hasDepartureTime
+    has_arr_time, has_duration = AIRPORT.hasArrivalTime, AIRPORT.hasDuration
+    has_distance = AIRPORT.hasDistance
+
+    triples = []
+    add = triples.append
+    for flight_uri, s, d, airline, airline_sanitized, number, dep, arr, duration, distance in zip(
+            flight_uris, src, dst, airlines, sanitized, numbers, dep_times, arr_times, durations, distances):
+        add((flight_uri, RDF.type, flight_type))
+        add((flight_uri, has_dep, iata_map[s]))
+        add((flight_uri, has_arr, iata_map[d]))
+        add((flight_uri, operated_by, terms.literal(airline)))
+
+        if airline not in airlines_map:
+            airline_uri = AIRPORT[f"Airline_{airline_sanitized}"]
+            add((airline_uri, RDF.type, AIRPORT.Airline))
+            add((airline_uri, RDFS.label, terms.literal(airline, lang="en")))
+            airlines_map[airline] = airline_uri
+
+        add((flight_uri, operated_by, airlines_map[airline]))
+
+        if number:
+            add((flight_uri, has_number, terms.literal(number, XSD.integer)))
+        if dep:
+            add((flight_uri, has_dep_time, terms.literal(dep, XSD.string)))
+        if arr:
+            add((flight_uri, has_arr_time, terms.literal(arr, XSD.string)))
+        if duration is not None:
+            add((flight_uri, has_duration, terms.literal(duration, XSD.integer)))
+        if distance and distance.strip():
+            add((flight_uri, has_distance, terms.literal(distance, XSD.integer)))
+
+    return triples
+
+def populate_ontology(g):
+    """Populate the ontology with flight data"""
+
+    iata_map = build_iata_map(g)
     airlines_map = {}
+    triples_before = insert_count(g)
 
     with open("flights.csv") as f:  # Read CSV file with the flight data
         reader = csv.reader(f)
@@ -40,64 +206,394 @@ def populate_ontology(g):
             
             counter += 1
 
-            src_iata = row[13]
-            dst_iata = row[14]
-            airline = row[20]
-            flight_number = row[11]
-            depart_time = format_time(row[4])
-            arrival_time = format_time(row[7])
-            air_time = row[15]  
-            distance = row[16] 
-
-            if src_iata in iata_map and dst_iata in iata_map: # Match IATA codes to Aiports
-                src_airport = iata_map[src_iata]
-                dst_airport = iata_map[dst_iata]
-
-                airline_sanitized = re.sub(r'\W+', '_', airline.strip())
-
-                # Add Flight
-                flight_uri = URIRef(AIRPORT + f"Flight_{src_iata}_{dst_iata}_{airline_sanitized}_{flight_number}")
-                g.add((flight_uri, RDF.type, AIRPORT.Flight))
-                g.add((flight_uri, AIRPORT.hasDepartureAirport, src_airport))
-                g.add((flight_uri, AIRPORT.hasArrivalAirport, dst_airport))
-                g.add((flight_uri, AIRPORT.operatedBy, Literal(airline)))
-
-                # Add Airline
-                if airline not in airlines_map:
-                    airline_uri = AIRPORT[f"Airline_{airline_sanitized}"]
-                    g.add((airline_uri, RDF.type, AIRPORT.Airline))
-                    g.add((airline_uri, RDFS.label, Literal(airline, lang="en")))
+            for triple in flight_triples(row, iata_map, airlines_map):
+                g.add(triple)
+
+    metrics.count("rows_read", counter - 1)
+    metrics.count("triples_added", insert_count(g) - triples_before)
+    return g
+
+def read_batches(csv_path, batch_size):
+    """Yield the data rows of a CSV file in lists of at most batch_size rows"""
+
+    with open(csv_path, newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None) # Skip header row
+
+        while True:
+            batch = list(islice(reader, batch_size))
+            if not batch:
+                break
+            yield batch
+
+def stream_ontology(g, csv_path="flights.csv", batch_size=10000, sink=None, columnar=True):
+    """Stream every flight in the CSV into the graph, or into an N-Triples/N-Quads sink, batch by batch"""
+
+    iata_map = build_iata_map(g)
+    airlines_map = {}
+    quads = sink is not None and sink.endswith(".nq")
+    out = open(sink, "w", encoding="utf-8") if sink else None
+
+    rows = 0
+    triples = 0
+    written = SinkFilter()
+    start = time.perf_counter()
+
+    try:
+        for batch in read_batches(csv_path, batch_size):
+            if columnar:
+                batch_triples = convert_batch(batch, iata_map, airlines_map)
+            else:
+                batch_triples = [t for row in batch for t in flight_triples(row, iata_map, airlines_map)]
+
+            if out is None:  # Commit the whole batch in one call
+                before = insert_count(g)
+                g.addN((s, p, o, g) for s, p, o in batch_triples)
+                triples += insert_count(g) - before # Repeated triples are already in the graph
+            else:
+                fresh = written.fresh(_sink_line(t, quads) for t in batch_triples)
+                out.write("".join(fresh))
+                triples += len(fresh)
+
+            rows += len(batch)
+    finally:
+        if out is not None:
+            out.close()
+
+    return _report(rows, triples, start)
+
+def _sink_line(triple, quads):
+    """Serialize a triple as an N-Triples (or N-Quads) line"""
+    line = _nt_row(triple)
+    if quads:
+        return f"{line[:-3]} {FLIGHTS_GRAPH.n3()} .\n"
+    return line
+
+class SinkFilter:
+    """Drops sink lines already written, with bounded memory
+
+    Only two kinds of line repeat: the triples of an airline, emitted again
+    by each worker that meets it, and the triples of a flight listed more
+    than once. The airlines are few and all kept; the lines of the last
+    max_flights flights are kept, so a flight repeated further apart than
+    that is written again. Lines are remembered by their 64-bit hash, about
+    35 MB for the default window of 100,000 flights.
+    """
+
+    def __init__(self, max_flights=FLIGHT_WINDOW):
+        self.max_flights = max_flights
+        self.entities = set()
+        self.flights = OrderedDict()  # Flight subject hash -> hashes of its lines written so far, least recent first
+
+    def fresh(self, lines):
+        """The lines not written before, in order"""
+
+        fresh = []
+        for line in lines:
+            key = hash(line)
+            subject = line[:line.index(" ")]
+            if "#Flight_" not in subject:
+                if key in self.entities:
+                    continue
+                self.entities.add(key)
+            else:
+                subject = hash(subject)
+                seen = self.flights.get(subject)
+                if seen is None:
+                    seen = self.flights[subject] = array("q")
+                    if len(self.flights) > self.max_flights:
+                        self.flights.popitem(last=False)
+                else:
+                    self.flights.move_to_end(subject)
+                if key in seen:
+                    continue
+                seen.append(key)
+            fresh.append(line)
+        return fresh
+
+def _report(rows, triples, start):
+    """Print and return the ingestion throughput"""
+
+    elapsed = time.perf_counter() - start
+    metrics.count("rows_read", rows)
+    metrics.count("triples_added", triples)
+    stats = {
+        "rows": rows,
+        "triples": triples,
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed if elapsed else 0.0,
+        "triples_per_sec": triples / elapsed if elapsed else 0.0,
+    }
+    print(f"Streamed {rows} rows into {triples} triples in {elapsed:.2f}s "
+          f"({stats['rows_per_sec']:.0f} rows/sec, {stats['triples_per_sec']:.0f} triples/sec)")
+    return stats
+
+def byte_ranges(csv_path, parts):
+    """Split the data section of a CSV file (after the header) into byte ranges"""
+
+    with open(csv_path, "rb") as f:
+        f.readline() # Skip header row
+        data_start = f.tell()
+    size = os.path.getsize(csv_path)
+
+    step = max(1, -(-(size - data_start) // parts))
+    return [(start, min(start + step, size)) for start in range(data_start, size, step)]
+
+_worker_iata_map = None
+
+def _init_worker(iata_strings):
+    global _worker_iata_map
+    _worker_iata_map = {code: terms.uri(uri) for code, uri in iata_strings.items()}
+
+def _convert_range(csv_path, start, end, batch_size, as_lines, quads):
+    """Convert the rows whose first byte lies in [start, end) - runs in a worker process"""
+
+    with open(csv_path, "rb") as f:
+        f.seek(start - 1)
+        if f.read(1) != b"\n":
+            f.readline() # The partial row belongs to the previous range
+
+        lines = []
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            lines.append(line.decode("utf-8"))
+
+    airlines_map = {}
+    rows = list(csv.reader(io.StringIO("".join(lines))))
+    triples = []
+    skipped = metrics.counter("rows_skipped_iata")
+    for i in range(0, len(rows), batch_size):
+        triples.extend(convert_batch(rows[i:i + batch_size], _worker_iata_map, airlines_map))
+    skipped = metrics.counter("rows_skipped_iata") - skipped # Counted in the worker, reported by the parent
+
+    if as_lines:
+        return len(rows), skipped, [_sink_line(t, quads) for t in triples]
+    return len(rows), skipped, triples
+
+def parallel_ontology(g, csv_path="flights.csv", workers=None, batch_size=10000, sink=None):
+    """Convert the flight CSV in a process pool, one chunk of about CHUNK_BYTES per task, and merge the results in file order
+
+    Rows must not contain quoted line breaks. At most two chunks per worker
+    are pending at a time, so memory does not grow with the file. The sink
+    output goes through the same SinkFilter as stream_ontology and is
+    identical to a sequential run.
+    """
+
+    workers = workers or os.cpu_count() or 1
+    iata_strings = {code: str(uri) for code, uri in build_iata_map(g).items()}
+    ranges = byte_ranges(csv_path, max(workers, -(-os.path.getsize(csv_path) // CHUNK_BYTES)))
+    quads = sink is not None and sink.endswith(".nq")
+    as_lines = sink is not None
+
+    rows = 0
+    triples = 0
+    written = SinkFilter()
+    start = time.perf_counter()
+
+    def merge(task):
+        nonlocal rows, triples
+        n_rows, skipped, chunk = task.result()
+        rows += n_rows
+        metrics.count("rows_skipped_iata", skipped)
+        if out is None:
+            before = insert_count(g)
+            # Terms unpickled from the workers are new objects; share one instance of each
+            g.addN((terms.intern(s), p, terms.intern(o), g) for s, p, o in chunk)
+            triples += insert_count(g) - before
+        else:
+            fresh = written.fresh(chunk)
+            out.write("".join(fresh))
+            triples += len(fresh)
+
+    out = open(sink, "w", encoding="utf-8") if sink else None
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(iata_strings,)) as pool:
+            pending = deque()
+            for a, b in ranges:
+                pending.append(pool.submit(_convert_range, csv_path, a, b, batch_size, as_lines, quads))
+                if len(pending) >= workers * 2:
+                    merge(pending.popleft()) # Merge in range order to keep the output deterministic
+            while pending:
+                merge(pending.popleft())
+    finally:
+        if out is not None:
+            out.close()
+
+    return _report(rows, triples, start)
+
+def apply_delta(g, delta_path):
+    """Apply a delta CSV of new, changed or cancelled flights and return the (added, removed) triples
+
+    The delta has the flights.csv columns plus an "action" column: "add" for a
+    new flight, "update" to replace every property of an existing flight and
+    "cancel" to retract it. Only the Flight_{src}_{dst}_{airline}_{number}
+    subjects named in the delta are touched.
+    """
+
+    iata_map = build_iata_map(g)
+    airlines_map = {}
+    added = []
+    removed = []
+    skipped = 0
+
+    with open(delta_path, newline="") as f:
+        reader = csv.reader(f)
+        action_col = next(reader).index("action")
+
+        for row in reader:
+            action = row[action_col].strip().lower()
+            if action not in ("add", "update", "cancel"):
+                raise ValueError(f"Unknown action {row[action_col]!r} in {delta_path}")
+
+            src_iata, dst_iata, airline, flight_number = row[13], row[14], row[20], row[11]
+            if src_iata not in iata_map or dst_iata not in iata_map: # Unknown airports
+                skipped += 1
+                continue
+
+            airline_sanitized = re.sub(r'\W+', '_', airline.strip())
+            flight_uri = make_flight_uri(src_iata, dst_iata, airline_sanitized, flight_number)
+
+            if airline not in airlines_map: # Reuse airline entities that are already in the graph
+                airline_uri = AIRPORT[f"Airline_{airline_sanitized}"]
+                if (airline_uri, RDF.type, AIRPORT.Airline) in g:
                     airlines_map[airline] = airline_uri
 
-                g.add((flight_uri, AIRPORT.operatedBy, airlines_map[airline]))
+            old = set() if action == "add" else set(g.triples((flight_uri, None, None)))
+            new = set() if action == "cancel" else set(flight_triples(row, iata_map, airlines_map))
 
-                if flight_number:
-                    g.add((flight_uri, AIRPORT.hasFlightNumber, Literal(flight_number, datatype=XSD.integer)))
+            for triple in old - new:
+                g.remove(triple)
+                removed.append(triple)
+            for triple in new - old:
+                if triple not in g:
+                    g.add(triple)
+                    added.append(triple)
 
-                if depart_time:
-                    g.add((flight_uri, AIRPORT.hasDepartureTime, Literal(depart_time, datatype=XSD.string)))
-                
-                if arrival_time:
-                    g.add((flight_uri, AIRPORT.hasArrivalTime, Literal(arrival_time, datatype=XSD.string)))
-                
-                if air_time and air_time.strip():
-                    duration_minutes = int(float(air_time))
-                    g.add((flight_uri, AIRPORT.hasDuration, Literal(duration_minutes, datatype=XSD.integer)))
-                
-                if distance and distance.strip():
-                    g.add((flight_uri, AIRPORT.hasDistance, Literal(distance, datatype=XSD.integer)))
+    metrics.count("rows_skipped_iata", skipped)
+    metrics.count("triples_added", len(added))
+    metrics.count("triples_removed", len(removed))
+    print(f"Applied delta: {len(added)} triples added, {len(removed)} removed, {skipped} rows with unknown airports skipped")
+    return added, removed
 
-    return g
+def net_changes(g, added, removed):
+    """Collapse several rounds of changes into the (added, removed) triples that take the old graph to g
+
+    A triple removed by the delta and derived again by the reasoner, or
+    added and later retracted, is only kept on the side that holds in g.
+    """
+
+    return ([t for t in dict.fromkeys(added) if t in g],
+            [t for t in dict.fromkeys(removed) if t not in g])
+
+def write_changeset(path, added, removed):
+    """Write added/removed triples as an RDF Patch (D/A lines inside one transaction)"""
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("TX .\n")
+        f.writelines(f"D {_nt_row(t)}" for t in removed)
+        f.writelines(f"A {_nt_row(t)}" for t in added)
+        f.write("TC .\n")
+
+def read_changeset(path):
+    """Read an RDF Patch written by write_changeset into (added, removed) triple lists"""
+
+    lines = {"A": [], "D": []}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line[:2] in ("A ", "D "):
+                lines[line[0]].append(line[2:])
+
+    def parse(nt_lines):
+        return list(Graph().parse(data="".join(nt_lines), format="nt")) if nt_lines else []
+
+    return parse(lines["A"]), parse(lines["D"])
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add flight data to the populated airports ontology")
+    parser.add_argument("--stream", action="store_true", help="ingest every row of the CSV in batches (no 500-row limit)")
+    parser.add_argument("--csv", default="flights.csv", help="flight CSV file used in streaming mode")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows per batch in streaming mode")
+    parser.add_argument("--sink", help="write flight triples to this .nt/.nq file instead of the ontology")
+    parser.add_argument("--workers", type=int, help="convert the CSV in this many processes (implies --stream)")
+    parser.add_argument("--store", help="append into this persistent SQLite store instead of rewriting the .owl file")
+    parser.add_argument("--delta", help="apply a CSV of added/updated/cancelled flights to the populated flights ontology")
+    parser.add_argument("--changeset", help="RDF Patch file for the changes made by --delta (default: next to the ontology)")
+    parser.add_argument("--reason", action="store_true", help="with --delta, also update the SWRL inferences affected by the change")
+    parser.add_argument("--row-wise", action="store_true", help="convert rows one at a time instead of by column")
+    parser.add_argument("--format", default="xml", choices=FORMATS,
+                        help="output format; xml (RDF/XML) opens in Protégé, the others are streamed and much faster")
+    add_arguments(parser)
+    term_cache.add_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+    term_cache.configure(args)
 
-    g = Graph()
-    g.parse("populated_airports.owl", format="xml") # Load the populated airports ontology
+    with metrics.stage("load"):
+        if args.store:
+            g = open_store(args.store, seed="populated_airports.owl") # Airports are loaded only into a new store
+        elif args.delta:
+            g = load_graph("populated_flights.owl") # Deltas are applied to the existing flights ontology
+        else:
+            g = load_graph("populated_airports.owl") # Load the populated airports ontology (or its snapshot)
     g.bind("airport", AIRPORT)
     
     print(f"Loaded ontology with {len(g)} triples")
     
-    g = populate_ontology(g) # Populate the ontology
+    if args.sink:
+        with metrics.stage("ingest"):
+            if args.workers:
+                parallel_ontology(g, args.csv, args.workers, args.batch_size, sink=args.sink)
+            else:
+                stream_ontology(g, args.csv, args.batch_size, sink=args.sink, columnar=not args.row_wise) # Stream straight to the sink
+            count_terms()
+            metrics.count("bytes_written", os.path.getsize(args.sink))
+        print(f"Saved flight triples to {args.sink}")
+        finish(args)
+        sys.exit(0)
+
+    if args.delta:
+        changeset = args.changeset or os.path.splitext(args.store or "populated_flights.owl")[0] + ".rdfp"
+        with metrics.stage("delta"):
+            added, removed = apply_delta(g, args.delta)
+        if args.reason:
+            from swrl_reasoner import load_rules, incremental_update
+            with metrics.stage("reason"):
+                inferred_added, inferred_removed = incremental_update(g, *load_rules(), added, removed)
+            added, removed = net_changes(g, added + inferred_added, removed + inferred_removed)
+        write_changeset(changeset, added, removed) # Includes what the reasoner asserted or retracted
+        print(f"Saved changeset to {changeset}")
+    else:
+        with metrics.stage("ingest"):
+            if args.workers:
+                parallel_ontology(g, args.csv, args.workers, args.batch_size)
+            elif args.stream:
+                stream_ontology(g, args.csv, args.batch_size, columnar=not args.row_wise)
+            else:
+                g = populate_ontology(g) # Populate the ontology
+            count_terms()
     
-    g.serialize(destination="populated_flights.owl", format="xml") # Save the populated ontology
-    print(f"Saved populated ontology to populated_flights.owl")
\ No newline at end of file
+    # A full build of the ontology file also writes the side files. After a delta, or into a store,
+    # they are left stale and rebuilt by load_index/load_columns the next time they are used.
+    eager = not (args.store or args.delta)
+    if eager:
+        with metrics.stage("index"):
+            index = FlightIndex.from_graph(g) # Materialized joins for query_intermediate.py
+        with metrics.stage("columns"):
+            columns = FlightColumns.from_graph(g) # Typed times, durations and distances for flight_columns.py
+    with metrics.stage("save"):
+        if args.store:
+            g.close()
+            print(f"Saved populated ontology to {args.store}")
+        else:
+            path = save_graph(g, "populated_flights.owl", args.format) # Save the populated ontology and its snapshot
+            print(f"Saved populated ontology to {path}")
+        if eager:
+            save_index(index, "populated_flights.owl") # Written last so they are newer than the ontology
+            save_columns(columns, "populated_flights.owl")
+    if eager:
+        print(f"Saved flight index with {len(index.flights)} flights and {len(index.routes)} routes")
+    finish(args)
@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.evaluate import evalQuery
+from rdflib.store import TripleAddedEvent, TripleRemovedEvent
+
+class GraphVersion:
+    """Counter that changes whenever the graph is modified"""
+
+    def __init__(self, g):
+        self.g = g
+        self.events = 0
+        # rdflib's Memory store fires no event on removal, so there the triple count is part of the version
+        self.count_triples = not getattr(g.store, "dispatches_removals", False)
+        g.store.dispatcher.subscribe(TripleAddedEvent, self._bump)
+        g.store.dispatcher.subscribe(TripleRemovedEvent, self._bump)
+
+    def _bump(self, event):
+        self.events += 1
+
+    def current(self):
+        return (self.events, len(self.g)) if self.count_triples else self.events
+
+_parse_lock = threading.Lock()  # rdflib's pyparsing grammar cannot parse in several threads at once
+
+@lru_cache(maxsize=128)
+def prepare(query, namespaces):
+    """Parse and algebrize a query once per text and prefix set"""
+
+    with _parse_lock:
+        return prepareQuery(query, initNs=dict(namespaces))
+
+class RowStream:
+    """SELECT rows read straight from the query evaluation, for a single pass
+
+    rdflib's Result keeps every row it yields so it can be iterated again.
+    This has the same .type, .vars and rows, but each row is dropped once
+    consumed, so exporting a large result does not hold it in memory.
+    """
+
+    type = "SELECT"
+
+    def __init__(self, variables, rows):
+        self.vars = variables
+        self._rows = rows
+
+    def __iter__(self):
+        return self._rows
+
+class QueryCache:
+    """Prepared queries with a bounded LRU cache of their results, keyed on the graph version"""
+
+    def __init__(self, g, queries=None, maxsize=32):
+        self.g = g
+        self.version = GraphVersion(g)
+        self.namespaces = tuple((prefix, str(uri)) for prefix, uri in g.namespaces())
+        self.prepared = {key: prepare(q["query"], self.namespaces) for key, q in (queries or {}).items()} # Parsed once at startup
+        self.results = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def query(self, query):
+        """Run a predefined query by key, or any SPARQL text, reusing results while the graph is unchanged"""
+
+        cache_key = (query, self.version.current())
+        with self.lock: # Shared by the query threads of sparql_service.py
+            result = self.results.get(cache_key)
+            if result is not None:
+                self.hits += 1
+                self.results.move_to_end(cache_key)
+                return result
+            self.misses += 1
+
+        result = self.g.query(self._prepared(query))
+        if result.type == "SELECT":
+            result.bindings  # Materialize the rows so the result can be iterated again
+        with self.lock:
+            self.results[cache_key] = result
+            if len(self.results) > self.maxsize:
+                self.results.popitem(last=False)
+        return result
+
+    def _prepared(self, query):
+        return self.prepared.get(query) or prepare(query, self.namespaces)
+
+    def stream(self, query):
+        """Run a query without caching; SELECT rows are consumed as they are produced and not kept (see RowStream)"""
+
+        prepared = self._prepared(query)
+        if prepared.algebra.name != "SelectQuery":
+            return self.g.query(prepared)
+        result = evalQuery(self.g, prepared)
+        return RowStream(result["vars_"], result["bindings"])
+
+    def info(self):
+        return f"cache: {self.hits} hits, {self.misses} misses, {len(self.results)}/{self.maxsize} results"
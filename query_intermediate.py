@@ -1,36 +1,14 @@
-from rdflib import Graph, Namespace
-from tabulate import tabulate
+import time
+from rdflib import Namespace
+from snapshot import load_graph
+from sqlite_store import open_store
+from query_cache import QueryCache
+from instrumentation import metrics, add_arguments, configure, finish
+from result_render import print_pages, export_results
+from flight_index import load_index
 
 AIRPORT = Namespace("http://www.semanticweb.org/marikaitiprimenta/ontologies/2025/4/airports#")
 
-def formatted_results(results):
-    """Format the query results for better readability"""
-
-    if not results or len(results) == 0:
-        return "No results found."
-    
-    headers = results.vars
-    
-    # Convert results to a list of lists for tabulate
-    rows = []
-    for row in results:
-        row_values = []
-        for col in headers:
-            val = row.get(col)
-            if val is None:
-                row_values.append("")
-            else:
-                val_str = str(val)
-                if val_str.startswith('http://'):
-                    if '#' in val_str:   # Extract the fragment identifier or the last part of the URI
-                        val_str = val_str.split('#')[-1]
-                    else:
-                        val_str = val_str.split('/')[-1]
-                row_values.append(val_str)
-        rows.append(row_values)
-    
-    return tabulate(rows, headers=[str(h) for h in headers], tablefmt="grid")
-
 def defined_queries():
     """Dictionary of predefined queries"""
     return {
@@ -131,36 +109,68 @@ def defined_queries():
     }
 
 
-def queries_exec(g):
-    """Select queries to execute - interactive user interface"""
+def queries_exec(g, index=None, cache_size=32, page_size=30):
+    """Select queries to execute - interactive user interface (answered from the flight index when given)"""
     queries = defined_queries()
+    cache = QueryCache(g, queries, cache_size) # Queries are parsed once, results reused until the graph changes
     
     while True:
         print("Select a query to execute:")
         for key, query in queries.items():
             print(f"{key}. {query['name']}")
         
-        query_choice = input("\nSelect a query (1-4): ").strip()
+        query_choice, _, export_path = input("\nSelect a query (1-4), optionally followed by a .csv/.jsonl/.parquet file to export to: ").strip().partition(" ")
+        export_path = export_path.strip()
 
         if query_choice in queries:
-            query = queries[query_choice]["query"]
             print(f"\nExecuting query: {queries[query_choice]['name']}")
-            results = g.query(query)
-            if results:
-                print("\n" + formatted_results(results))
+            if export_path: # Exports stream the rows straight to the file, bypassing the cache
+                try:
+                    count = export_results(index.answer(query_choice) if index else cache.stream(query_choice), export_path)
+                except (ImportError, ValueError) as e:
+                    print(e)
+                    continue
+                print(f"Exported {count} rows to {export_path}")
+                continue
+            start = time.time()
+            with metrics.stage(f"query {query_choice}"): # Timed without the paging below
+                results = index.answer(query_choice) if index else cache.query(query_choice)
+            print(f"Answered in {(time.time() - start) * 1000:.1f} ms")
+            print_pages(results, page_size)
+            if not index:
+                print(cache.info())
         else:
             print("Invalid query selection.")
 
 if __name__ == "__main__":
-    
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query the populated ontology")
+    parser.add_argument("--store", help="query this persistent SQLite store instead of the .owl file")
+    parser.add_argument("--no-index", action="store_true", help="run the SPARQL queries instead of answering from the flight index (always the case with --store)")
+    parser.add_argument("--page-size", type=int, default=30, help="result rows shown per page")
+    parser.add_argument("--cache-size", type=int, default=32, help="number of query results kept in the LRU cache")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
     ontology_file = "populated_flights.owl" #populated ontology for airports and flights (from file populate_intermediate.py)
     
-    g = Graph()
-    g.parse(ontology_file, format="xml")
+    with metrics.stage("load"):
+        if args.store:
+            g = open_store(args.store)
+        else:
+            g = load_graph(ontology_file) # Uses the snapshot when it is newer than the .owl file
     
     g.bind("airport", AIRPORT)
     g.bind("rdf", "http://www.w3.org/1999/02/22-rdf-syntax-ns#")
     g.bind("rdfs", "http://www.w3.org/2000/01/rdf-schema#")
     g.bind("owl", "http://www.w3.org/2002/07/owl#")
     
-    queries_exec(g)
\ No newline at end of file
+    with metrics.stage("index"):
+        # Rebuilt when the ontology is newer; a store is queried with SPARQL rather than read whole into memory
+        index = None if args.no_index or args.store else load_index(g, ontology_file)
+    try:
+        queries_exec(g, index, args.cache_size, args.page_size)
+    except (EOFError, KeyboardInterrupt): # End of input or Ctrl-C ends the session
+        finish(args)
\ No newline at end of file
@@ -0,0 +1,178 @@
+import gzip
+import io
+import os
+import re
+from rdflib import Graph, Literal, URIRef
+from rdflib.namespace import RDF
+from rdflib.plugins.serializers.nt import _quoteLiteral, _quote_encode
+
+# Output formats: syntax plus optional compression. RDF/XML is written by rdflib (for Protégé);
+# the others are streamed triple by triple
+FORMATS = ["xml", "nt", "ttl", "nt.gz", "ttl.gz", "nt.zst", "ttl.zst"]
+EXTENSIONS = {"nt": ".nt", "ttl": ".ttl"}
+PARSE_FORMATS = {".nt": "nt", ".ttl": "turtle"}
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+CHUNK_TRIPLES = 10000  # Triples rendered per write
+TERM_CACHE = 500000  # Spelled-out terms kept between triples
+
+PN_LOCAL = re.compile(r"[A-Za-z_][A-Za-z0-9_\-]*$")  # Local names that are safe to write as prefix:name
+
+def split_format(fmt):
+    """'ttl.gz' -> ('ttl', 'gz')"""
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format {fmt!r} (use one of {', '.join(FORMATS)})")
+    syntax, _, compression = fmt.partition(".")
+    return syntax, compression or None
+
+def output_path(path, fmt):
+    """File name for writing the ontology at path in the given format (RDF/XML keeps the name)"""
+
+    syntax, compression = split_format(fmt)
+    if syntax == "xml":
+        return path
+    return os.path.splitext(path)[0] + EXTENSIONS[syntax] + (f".{compression}" if compression else "")
+
+def find_source(path):
+    """The newest existing file among path and its other-format variants (path itself when none exists)"""
+
+    candidates = [p for p in dict.fromkeys(output_path(path, fmt) for fmt in FORMATS) if os.path.exists(p)]
+    return max(candidates, key=os.path.getmtime) if candidates else path
+
+def _open_zstd(path, mode):
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd compression needs the zstandard package (pip install zstandard)")
+    if mode == "w":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, "wb"), closefd=True)
+    return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+
+def open_output(path, compression):
+    """Text stream for writing, compressed as requested"""
+
+    if compression == "gz":
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=GZIP_LEVEL)
+    if compression == "zst":
+        return io.TextIOWrapper(_open_zstd(path, "w"), encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+def ntriples_chunks(g, chunk_size=CHUNK_TRIPLES):
+    """Yield the graph as N-Triples text, chunk_size triples at a time"""
+
+    spelled = {}  # Terms repeat across triples (predicates, airports, times), so each is spelled once
+    def n3(term):
+        text = spelled.get(term)
+        if text is None:
+            if len(spelled) >= TERM_CACHE:
+                spelled.clear()
+            text = spelled[term] = _quoteLiteral(term) if isinstance(term, Literal) else term.n3()
+        return text
+
+    lines = []
+    for s, p, o in g:
+        lines.append(f"{n3(s)} {n3(p)} {n3(o)} .\n")
+        if len(lines) >= chunk_size:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+class _Names:
+    """Turtle spelling of terms using the graph's prefixes"""
+
+    def __init__(self, g):
+        self.prefixes = {str(uri): prefix for prefix, uri in g.namespaces() if str(uri)[-1:] in "#/"}
+        self.predicates = {RDF.type: "a"}
+
+    def uri(self, uri):
+        cut = max(uri.rfind("#"), uri.rfind("/")) + 1
+        prefix = self.prefixes.get(uri[:cut])
+        if prefix is not None and PN_LOCAL.match(uri, cut):
+            return f"{prefix}:{uri[cut:]}"
+        return uri.n3()
+
+    def predicate(self, uri):
+        name = self.predicates.get(uri)
+        if name is None:
+            name = self.predicates[uri] = self.uri(uri)
+        return name
+
+    def term(self, term):
+        if isinstance(term, Literal):
+            if term.language:
+                return f"{_quote_encode(term)}@{term.language}"
+            if term.datatype:
+                return f"{_quote_encode(term)}^^{self.uri(term.datatype)}"
+            return _quote_encode(term)
+        if isinstance(term, URIRef):
+            return self.uri(term)
+        return term.n3()  # Blank node
+
+def turtle_chunks(g, chunk_size=CHUNK_TRIPLES):
+    """Yield the graph as Turtle text, one block per subject, about chunk_size triples at a time"""
+
+    names = _Names(g)
+    yield "".join(f"@prefix {prefix}: <{uri}> .\n" for uri, prefix in names.prefixes.items()) + "\n"
+
+    spelled = {}
+    def term(o):
+        text = spelled.get(o)
+        if text is None:
+            if len(spelled) >= TERM_CACHE:
+                spelled.clear()
+            text = spelled[o] = names.term(o)
+        return text
+
+    blocks = []
+    pending = 0
+    for subject in g.subjects(unique=True):
+        objects = {}
+        for p, o in g.predicate_objects(subject):
+            objects.setdefault(p, []).append(term(o))
+        blocks.append(f"{names.term(subject)} " + " ;\n    ".join(
+            f"{names.predicate(p)} {', '.join(spelled_objects)}" for p, spelled_objects in objects.items()) + " .\n\n")
+        pending += sum(map(len, objects.values()))
+        if pending >= chunk_size:
+            yield "".join(blocks)
+            blocks = []
+            pending = 0
+    if blocks:
+        yield "".join(blocks)
+
+def write_graph(g, path, fmt="xml"):
+    """Write the graph in the given format; N-Triples and Turtle are streamed without building the document"""
+
+    syntax, compression = split_format(fmt)
+    if syntax == "xml":
+        g.serialize(destination=path, format="xml")
+        return path
+
+    chunks = ntriples_chunks(g) if syntax == "nt" else turtle_chunks(g)
+    tmp_path = path + ".tmp"
+    with open_output(tmp_path, compression) as out:
+        for chunk in chunks:
+            out.write(chunk)
+    os.replace(tmp_path, path)
+    return path
+
+def read_graph(path, fmt=None):
+    """Parse a file written by write_graph (or any RDF/XML file), decompressing .gz/.zst files"""
+
+    base, ext = os.path.splitext(path)
+    compression = ext[1:] if ext in (".gz", ".zst") else None
+    if compression:
+        ext = os.path.splitext(base)[1]
+
+    g = Graph()
+    if compression == "gz":
+        source = gzip.open(path, "rb")
+    elif compression == "zst":
+        source = _open_zstd(path, "r")
+    else:
+        source = open(path, "rb")
+    with source:
+        g.parse(file=source, format=fmt or PARSE_FORMATS.get(ext, "xml"))
+    return g
@@ -0,0 +1,102 @@
+import csv
+import json
+import os
+from itertools import islice
+from tabulate import tabulate
+
+def shorten(val):
+    """Display form of a value: the fragment identifier or last path segment of a URI"""
+
+    if val is None:
+        return ""
+    val_str = str(val)
+    if val_str.startswith('http://'):
+        if '#' in val_str:   # Extract the fragment identifier or the last part of the URI
+            val_str = val_str.split('#')[-1]
+        else:
+            val_str = val_str.split('/')[-1]
+    return val_str
+
+def iter_rows(results):
+    """Yield each result row as a list of values in .vars order, as the query produces them
+
+    Rows are kept only if the result keeps them: an rdflib Result does, a
+    RowStream (QueryCache.stream) does not.
+    """
+
+    headers = results.vars
+    for row in results:
+        yield [row.get(col) for col in headers]
+
+def iter_pages(results, page_size=30):
+    """Yield tabulated pages of page_size rows (all rows when None) with URI shortening applied per row"""
+
+    headers = [str(h) for h in results.vars]
+    rows = iter_rows(results)
+    while True:
+        page = [[shorten(val) for val in row] for row in islice(rows, page_size)]
+        if not page:
+            return
+        yield tabulate(page, headers=headers, tablefmt="grid")
+
+def formatted_results(results, page_size=None):
+    """Format the query results for better readability (the first page only when page_size is given)"""
+
+    for page in iter_pages(results, page_size):
+        return page
+    return "No results found."
+
+def print_pages(results, page_size=30, prompt=True):
+    """Print the results a page at a time, asking before each further page"""
+
+    shown = 0
+    for number, page in enumerate(iter_pages(results, page_size)):
+        if number and prompt and input("Press Enter for more rows, q to stop: ").strip().lower() == "q":
+            return
+        print("\n" + page)
+        shown += 1
+    if not shown:
+        print("\nNo results found.")
+
+def _plain(val):
+    return None if val is None else str(val)
+
+def export_results(results, path, batch_size=10000):
+    """Stream the results to a .csv, .jsonl or .parquet file and return the number of rows written"""
+
+    ext = os.path.splitext(path)[1].lower()
+    headers = [str(h) for h in results.vars]
+    count = 0
+
+    if ext == ".csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            for row in iter_rows(results):
+                writer.writerow(["" if val is None else str(val) for val in row])
+                count += 1
+    elif ext in (".jsonl", ".ndjson"):
+        with open(path, "w", encoding="utf-8") as f:
+            for row in iter_rows(results):
+                f.write(json.dumps(dict(zip(headers, map(_plain, row))), ensure_ascii=False) + "\n")
+                count += 1
+    elif ext == ".parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+
+        schema = pa.schema([(h, pa.string()) for h in headers])
+        rows = iter_rows(results)
+        with pq.ParquetWriter(path, schema) as writer:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                columns = [pa.array([_plain(row[i]) for row in batch], pa.string()) for i in range(len(headers))]
+                writer.write_batch(pa.record_batch(columns, schema=schema))
+                count += len(batch)
+    else:
+        raise ValueError(f"Unsupported export format: {path} (use .csv, .jsonl or .parquet)")
+    return count
@@ -0,0 +1,391 @@
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, deque
+from statistics import median
+from rdflib import Namespace, Literal, XSD
+from rdflib.namespace import RDF, RDFS
+from instrumentation import metrics
+import sidecar
+
+AIRPORT = Namespace("http://www.semanticweb.org/marikaitiprimenta/ontologies/2025/4/airports#")
+
+ROUTES_VERSION = 2
+DAY = 24 * 60
+
+def to_minutes(hhmm):
+    """Minutes since midnight for an "HH:MM" string from 00:00 to 23:59; raises ValueError otherwise"""
+
+    hours, sep, minutes = str(hhmm).partition(":")
+    if not (sep and len(minutes) == 2 and hours.isdigit() and minutes.isdigit()
+            and int(hours) < 24 and int(minutes) < 60):
+        raise ValueError(f"Not an HH:MM time between 00:00 and 23:59: {hhmm!r}")
+    return int(hours) * 60 + int(minutes)
+
+def literal_minutes(literal):
+    """to_minutes for a time in the ontology, or None (populate_intermediate writes midnight as "24:00")"""
+
+    if str(literal) == "24:00":
+        return 0
+    try:
+        return to_minutes(literal)
+    except ValueError:
+        return None
+
+def format_minutes(minutes):
+    """"HH:MM" for minutes counted from the first day, with "+N" for later days"""
+
+    day, minute = divmod(int(minutes), DAY)
+    return f"{minute // 60:02d}:{minute % 60:02d}" + (f" +{day}" if day else "")
+
+def _elapsed(dep_times, arr_times, durations):
+    """Minutes from departure to arrival of a flight
+
+    A flight that flies every day collects one time per day, so its departure
+    and arrival times can only be paired when there is exactly one of each;
+    otherwise the median hasDuration is used.
+    """
+
+    if len(dep_times) == 1 and len(arr_times) == 1:
+        return (arr_times[0] - dep_times[0]) % DAY
+    if durations:
+        return int(median(durations))
+    return None
+
+class RouteGraph:
+    """Compressed sparse row (CSR) adjacency between airports, with a timetable per route
+
+    Airports are numbered 0..n-1. The routes leaving airport a are positions
+    offsets[a] to offsets[a + 1] of route_to (sorted by destination), and the
+    departures of route r are positions trip_offsets[r] to trip_offsets[r + 1]
+    of the trip arrays, sorted by departure time. trip_best[i] is the earliest
+    arrival among departures i.. of the route, so the first possible arrival
+    after a given time is one binary search.
+    """
+
+    def __init__(self):
+        self.airports = []              # Airport URIs by number
+        self.ids = {}                   # airport -> number
+        self.offsets = array("l", [0])  # Routes of airport a: offsets[a]..offsets[a + 1]
+        self.route_to = array("l")      # Destination of each route
+        self.route_flights = array("l") # Flights on each route
+        self.route_km = array("d")      # Shortest hasDistance of each route (nan when unknown)
+        self.route_minutes = array("d") # Shortest flight time of each route (nan when unknown)
+        self.trip_offsets = array("l", [0])
+        self.trip_dep = array("l")      # Departure minute of each timetabled departure
+        self.trip_arr = array("l")      # Arrival minute (may be past midnight, > 1440)
+        self.trip_best = array("l")     # Earliest trip_arr from this departure to the end of its route
+        self.trip_best_at = array("l")  # Position of the departure giving trip_best
+        self.trip_flights = []          # Flight URI of each departure
+
+    @classmethod
+    def from_graph(cls, g):
+        """Build the adjacency with one pass per predicate"""
+
+        def values(predicate, convert=None):
+            table = defaultdict(list)
+            for s, o in g.subject_objects(predicate):
+                value = convert(o) if convert else o
+                if value is not None:
+                    table[s].append(value)
+            return table
+
+        def number(literal):
+            try:
+                return int(float(literal))
+            except ValueError:
+                return None
+
+        deps, arrs = values(AIRPORT.hasDepartureAirport), values(AIRPORT.hasArrivalAirport)
+        dep_times, arr_times = values(AIRPORT.hasDepartureTime, literal_minutes), values(AIRPORT.hasArrivalTime, literal_minutes)
+        durations, distances = values(AIRPORT.hasDuration, number), values(AIRPORT.hasDistance, number)
+
+        routes = defaultdict(lambda: [0, math.inf, math.inf, []]) # (dep, arr) -> flights, km, minutes, trips
+        for flight in g.subjects(RDF.type, AIRPORT.Flight):
+            elapsed = _elapsed(dep_times.get(flight, ()), arr_times.get(flight, ()), durations.get(flight, ()))
+            for dep in deps.get(flight, ()):
+                for arr in arrs.get(flight, ()):
+                    route = routes[dep, arr]
+                    route[0] += 1
+                    route[1] = min([route[1]] + distances.get(flight, []))
+                    if elapsed is not None:
+                        route[2] = min(route[2], elapsed)
+                        route[3].extend((minute, minute + elapsed, flight) for minute in dep_times.get(flight, ()))
+
+        index = cls()
+        def airport_id(airport):
+            if airport not in index.ids:
+                index.ids[airport] = len(index.airports)
+                index.airports.append(airport)
+            return index.ids[airport]
+
+        by_source = defaultdict(list)
+        for (dep, arr), route in routes.items():
+            by_source[airport_id(dep)].append((airport_id(arr), route))
+
+        for a in range(len(index.airports)):
+            for target, (flights, km, minutes, trips) in sorted(by_source.get(a, ()), key=lambda item: item[0]):
+                index.route_to.append(target)
+                index.route_flights.append(flights)
+                index.route_km.append(km if km != math.inf else math.nan)
+                index.route_minutes.append(minutes if minutes != math.inf else math.nan)
+
+                trips.sort(key=lambda trip: trip[0])
+                first = len(index.trip_dep)
+                best, best_at = math.inf, None
+                suffix = []
+                for i in range(len(trips) - 1, -1, -1):
+                    if trips[i][1] <= best:
+                        best, best_at = trips[i][1], first + i
+                    suffix.append((best, best_at))
+                index.trip_dep.extend(trip[0] for trip in trips)
+                index.trip_arr.extend(trip[1] for trip in trips)
+                index.trip_best.extend(best for best, _ in reversed(suffix))
+                index.trip_best_at.extend(best_at for _, best_at in reversed(suffix))
+                index.trip_flights.extend(trip[2] for trip in trips)
+                index.trip_offsets.append(len(index.trip_dep))
+            index.offsets.append(len(index.route_to))
+        return index
+
+    def __len__(self):
+        return len(self.airports)
+
+    def routes(self, a):
+        """Route positions leaving airport number a"""
+        return range(self.offsets[a], self.offsets[a + 1])
+
+    def _next_arrival(self, route, ready):
+        """(arrival, trip position) of the earliest arrival over route for a passenger ready at minute ready"""
+
+        lo, hi = self.trip_offsets[route], self.trip_offsets[route + 1]
+        if lo == hi:
+            return None
+        day, minute = divmod(ready, DAY)
+        i = bisect_left(self.trip_dep, minute, lo, hi)
+        tomorrow = (day + 1) * DAY + self.trip_best[lo], self.trip_best_at[lo] # Wait for the next day
+        if i < hi:
+            return min((day * DAY + self.trip_best[i], self.trip_best_at[i]), tomorrow)
+        return tomorrow
+
+    def reachable(self, airport, max_hops=2):
+        """Airports reachable from an airport in at most max_hops flights, with the fewest flights needed"""
+
+        source = self.ids.get(airport)
+        if source is None:
+            return {}
+        hops = {source: 0}
+        queue = deque([source])
+        while queue:
+            a = queue.popleft()
+            if hops[a] == max_hops:
+                continue
+            for route in self.routes(a):
+                b = self.route_to[route]
+                if b not in hops:
+                    hops[b] = hops[a] + 1
+                    queue.append(b)
+        del hops[source]
+        return {self.airports[b]: n for b, n in hops.items()}
+
+    def shortest(self, src, dst, weight="distance"):
+        """(total, airports on the way) of the shortest route by "distance" (km), "duration" (minutes) or "hops"
+
+        Returns None when dst cannot be reached.
+        """
+
+        costs = {"distance": self.route_km, "duration": self.route_minutes, "hops": None}[weight]
+        source, target = self.ids.get(src), self.ids.get(dst)
+        if source is None or target is None:
+            return None
+
+        best = {source: 0}
+        previous = {}
+        heap = [(0, source)]
+        while heap:
+            cost, a = heapq.heappop(heap)
+            if a == target:
+                path = [a]
+                while path[-1] != source:
+                    path.append(previous[path[-1]])
+                return cost, [self.airports[b] for b in reversed(path)]
+            if cost > best[a]:
+                continue
+            for route in self.routes(a):
+                step = 1 if costs is None else costs[route]
+                if math.isnan(step):
+                    continue
+                b = self.route_to[route]
+                if cost + step < best.get(b, math.inf):
+                    best[b] = cost + step
+                    previous[b] = a
+                    heapq.heappush(heap, (cost + step, b))
+        return None
+
+    def fastest(self, src, dst, depart="00:00", min_connection=45, max_hops=4):
+        """Earliest-arriving itinerary leaving src at or after depart, with at most max_hops flights
+
+        Each change of flight leaves at least min_connection minutes between
+        arrival and the next departure. Flights are taken to run every day at
+        their listed times. Returns a list of legs (flight, from, to, departure
+        minute, arrival minute), counted in minutes from midnight of the first
+        day, or None when dst cannot be reached. A depart string that is not
+        HH:MM raises ValueError.
+        """
+
+        start = to_minutes(depart) if isinstance(depart, str) else depart
+        source, target = self.ids.get(src), self.ids.get(dst)
+        if source is None or target is None:
+            return None
+
+        # Round k holds the airports whose earliest arrival improved using k flights (RAPTOR-style)
+        arrival = {source: start}
+        rounds = [{source: None}]
+        marked = {source}
+        for _ in range(max_hops):
+            improved = {}
+            ready_at = {a: arrival[a] + (0 if a == source else min_connection) for a in marked} # Labels of the previous round
+            for a, ready in ready_at.items():
+                for route in self.routes(a):
+                    found = self._next_arrival(route, ready)
+                    if found is None:
+                        continue
+                    when, trip = found
+                    b = self.route_to[route]
+                    if when < arrival.get(b, math.inf) and when < arrival.get(target, math.inf):
+                        arrival[b] = when
+                        improved[b] = (a, route, trip, when - self.trip_arr[trip] + self.trip_dep[trip])
+            if not improved:
+                break
+            rounds.append(improved)
+            marked = set(improved)
+
+        if target not in arrival or target == source:
+            return None
+        legs = []
+        b, k = target, max(k for k, improved in enumerate(rounds) if target in improved)
+        while b != source:
+            a, route, trip, departure = rounds[k][b]
+            legs.append((self.trip_flights[trip], self.airports[a], self.airports[b],
+                         departure, departure - self.trip_dep[trip] + self.trip_arr[trip]))
+            k = max(j for j in range(k) if a in rounds[j]) # The label of a that this leg was taken from
+            b = a
+        return legs[::-1]
+
+    def degree_ranking(self, top=10, by="out"):
+        """Airports with the most routes leaving ("out"), arriving ("in"), or the most flights ("flights")"""
+
+        if by == "out":
+            scores = [self.offsets[a + 1] - self.offsets[a] for a in range(len(self.airports))]
+        else:
+            scores = [0] * len(self.airports)
+            for a in range(len(self.airports)):
+                for route in self.routes(a):
+                    if by == "in":
+                        scores[self.route_to[route]] += 1
+                    else:
+                        scores[a] += self.route_flights[route]
+                        scores[self.route_to[route]] += self.route_flights[route]
+        return [(self.airports[a], scores[a]) for a in heapq.nlargest(top, range(len(scores)), key=scores.__getitem__)]
+
+    def pagerank(self, top=10, damping=0.85, iterations=30):
+        """Airports ranked by PageRank over the routes, weighted by their number of flights"""
+
+        n = len(self.airports)
+        if not n:
+            return []
+        out_flights = [sum(self.route_flights[r] for r in self.routes(a)) for a in range(n)]
+        rank = [1.0 / n] * n
+        for _ in range(iterations):
+            dangling = sum(rank[a] for a in range(n) if not out_flights[a])
+            following = [(1 - damping + damping * dangling) / n] * n
+            for a in range(n):
+                if out_flights[a]:
+                    share = damping * rank[a] / out_flights[a]
+                    for route in self.routes(a):
+                        following[self.route_to[route]] += share * self.route_flights[route]
+            rank = following
+        return [(self.airports[a], rank[a]) for a in heapq.nlargest(top, range(n), key=rank.__getitem__)]
+
+def save_routes(routes, path):
+    """Write the route graph next to an .owl file or store"""
+    sidecar.save(routes, path, ".routes", ROUTES_VERSION)
+
+def load_routes(g, path):
+    """Load the route graph for an .owl file or store, rebuilding it when the source is newer"""
+    return sidecar.load_or_build(path, ".routes", ROUTES_VERSION, RouteGraph, lambda: RouteGraph.from_graph(g))
+
+if __name__ == "__main__":
+    import argparse
+    from tabulate import tabulate
+    from snapshot import load_graph
+    from sqlite_store import open_store
+    from instrumentation import add_arguments, configure, finish
+
+    def clock(value):
+        try:
+            to_minutes(value)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+        return value
+
+    parser = argparse.ArgumentParser(description="Shortest and fastest itineraries, reachability and rankings over the flights")
+    parser.add_argument("--ontology", default="populated_flights.owl", help="ontology file with the flights")
+    parser.add_argument("--store", help="use this persistent SQLite store instead of the ontology file")
+    parser.add_argument("--from", dest="src", metavar="IATA", help="origin airport")
+    parser.add_argument("--to", dest="dst", metavar="IATA", help="destination airport")
+    parser.add_argument("--by", default="fastest", choices=["fastest", "distance", "duration", "hops"],
+                        help="itinerary search: fastest with connections, or shortest by distance, flight time or hops")
+    parser.add_argument("--depart", default="00:00", type=clock, help="earliest departure (HH:MM) for --by fastest")
+    parser.add_argument("--min-connection", type=int, default=45, help="minutes needed to change flights")
+    parser.add_argument("--max-hops", type=int, default=4, help="most flights in an itinerary, or hops for --reachable")
+    parser.add_argument("--reachable", action="store_true", help="list the airports reachable from --from within --max-hops")
+    parser.add_argument("--rank", choices=["out", "in", "flights", "pagerank"], help="rank the airports by degree or PageRank")
+    parser.add_argument("--top", type=int, default=10, help="rows for --rank")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    with metrics.stage("load"):
+        g = open_store(args.store) if args.store else load_graph(args.ontology)
+    with metrics.stage("routes"):
+        routes = load_routes(g, args.store or args.ontology)
+
+    def airport(code):
+        found = g.value(predicate=AIRPORT.hasIATACode, object=Literal(code, datatype=XSD.string))
+        if found not in routes.ids:
+            parser.error(f"No flights for an airport with IATA code {code}")
+        return found
+
+    def name(a):
+        return f"{g.value(a, RDFS.label) or a.split('#')[-1]} ({g.value(a, AIRPORT.hasIATACode) or '-'})"
+
+    with metrics.stage("query"):
+        if args.rank:
+            ranked = routes.pagerank(args.top) if args.rank == "pagerank" else routes.degree_ranking(args.top, args.rank)
+            print(tabulate([[name(a), f"{score:.6f}" if args.rank == "pagerank" else score] for a, score in ranked],
+                           headers=["airport", args.rank], tablefmt="grid", disable_numparse=True))
+        elif args.reachable and args.src:
+            found = sorted(routes.reachable(airport(args.src), args.max_hops).items(), key=lambda item: item[1])
+            print(tabulate([[name(a), hops] for a, hops in found], headers=["airport", "flights"], tablefmt="grid"))
+            print(f"{len(found)} airports reachable within {args.max_hops} flights")
+        elif args.src and args.dst:
+            src, dst = airport(args.src), airport(args.dst)
+            if args.by == "fastest":
+                legs = routes.fastest(src, dst, args.depart, args.min_connection, args.max_hops)
+                if legs:
+                    print(tabulate([[flight.split("#")[-1], name(a), name(b), format_minutes(dep), format_minutes(arr)]
+                                    for flight, a, b, dep, arr in legs],
+                                   headers=["flight", "from", "to", "departs", "arrives"], tablefmt="grid"))
+                    print(f"Arrives {format_minutes(legs[-1][4])}, {legs[-1][4] - legs[0][3]} minutes after the first departure")
+            else:
+                found = routes.shortest(src, dst, args.by)
+                legs = found and found[1]
+                if found:
+                    print(" -> ".join(name(a) for a in found[1]))
+                    print(f"Total {args.by}: {found[0]:g}")
+            if not legs:
+                print("No itinerary found.")
+        else:
+            parser.error("Give --rank, --reachable with --from, or --from and --to")
+    finish(args)
@@ -0,0 +1,65 @@
+import gzip
+import os
+import pickle
+import time
+from instrumentation import metrics
+from rdf_output import find_source
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+def sidecar_path(source, suffix):
+    """Side file kept next to an .owl file or SQLite store"""
+    return os.path.splitext(source)[0] + suffix
+
+def _state(obj):
+    getstate = getattr(obj, "__getstate__", None)
+    return getstate() if getstate is not None else vars(obj)
+
+def save(obj, source, suffix, version, compress=False):
+    """Write the state of obj next to source, replacing the previous file in one step
+
+    Only the state is pickled (builtins, arrays and rdflib terms), not the
+    class, so a file written by a script run as __main__ loads anywhere.
+    """
+
+    path = sidecar_path(source, suffix)
+    tmp_path = path + ".tmp"
+    with (gzip.open(tmp_path, "wb", compresslevel=6) if compress else open(tmp_path, "wb")) as f:
+        pickle.dump((version, _state(obj)), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    metrics.count("bytes_written", os.path.getsize(path))
+
+def load(source, suffix, version, cls):
+    """The cls instance saved next to source, or None when it is missing, older than source, unreadable or of another version"""
+
+    path = sidecar_path(source, suffix)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(find_source(source)):
+        return None
+    with open(path, "rb") as f:
+        compressed = f.read(2) == GZIP_MAGIC
+    try:
+        with (gzip.open if compressed else open)(path, "rb") as f:
+            saved_version, state = pickle.load(f)
+    except (OSError, EOFError, ValueError, TypeError, AttributeError, ImportError, pickle.UnpicklingError):
+        return None
+    if saved_version != version:
+        return None
+
+    obj = cls.__new__(cls)
+    setstate = getattr(obj, "__setstate__", None)
+    if setstate is not None:
+        setstate(state)
+    else:
+        obj.__dict__.update(state)
+    return obj
+
+def load_or_build(source, suffix, version, cls, build, compress=False):
+    """Load the side file of source, or call build() and save its result when the file is stale"""
+
+    obj = load(source, suffix, version, cls)
+    if obj is None:
+        start = time.time()
+        obj = build()
+        save(obj, source, suffix, version, compress)
+        print(f"Built {sidecar_path(source, suffix)} in {time.time() - start:.2f}s")
+    return obj
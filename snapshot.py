@@ -0,0 +1,125 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from rdflib import Graph, Literal, URIRef, BNode
+from instrumentation import metrics
+from rdf_output import find_source, output_path, read_graph, write_graph
+
+MAGIC = b"AOSNAP1\n"
+HEADER = struct.Struct("<QQ")  # term table length in bytes, number of triples
+
+def snapshot_path(owl_path):
+    """Snapshot file kept next to an .owl file"""
+    return os.path.splitext(owl_path)[0] + ".snap"
+
+def encode_term(term):
+    """Encode an rdflib term as a [kind, value, datatype, lang] list"""
+
+    if isinstance(term, Literal):
+        return ["L", str(term), str(term.datatype) if term.datatype else "", term.language or ""]
+    if isinstance(term, BNode):
+        return ["B", str(term), "", ""]
+    return ["U", str(term), "", ""]
+
+def decode_term(kind, value, datatype, lang):
+    """Inverse of encode_term"""
+
+    if kind == "L":
+        return Literal(value, datatype=URIRef(datatype) if datatype else None, lang=lang or None)
+    if kind == "B":
+        return BNode(value)
+    return URIRef(value)
+
+def write_snapshot(g, path):
+    """Write the graph as a dictionary-encoded term table followed by an array of integer triples"""
+
+    term_ids = {}
+    terms = []
+    ids = array("I")
+
+    for triple in g:
+        for term in triple:
+            term_id = term_ids.get(term)
+            if term_id is None:
+                term_id = term_ids[term] = len(terms)
+                terms.append(encode_term(term))
+            ids.append(term_id)
+
+    if sys.byteorder != "little":
+        ids.byteswap()
+
+    table = json.dumps({
+        "namespaces": [[prefix, str(uri)] for prefix, uri in g.namespaces()],
+        "terms": terms,
+    }, ensure_ascii=False).encode("utf-8")
+    table += b" " * (-len(table) % 4)  # keep the triple array 4-byte aligned
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(len(table), len(ids) // 3))
+        f.write(table)
+        ids.tofile(f)
+    os.replace(tmp_path, path)
+
+def load_snapshot(path, g=None):
+    """Load a snapshot written by write_snapshot into a (new) graph"""
+
+    g = Graph() if g is None else g
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an ontology snapshot")
+
+        offset = len(MAGIC)
+        table_len, n_triples = HEADER.unpack_from(mm, offset)
+        offset += HEADER.size
+        table = json.loads(mm[offset:offset + table_len].decode("utf-8"))
+        offset += table_len
+
+        for prefix, uri in table["namespaces"]:
+            g.bind(prefix, uri, override=True)
+        terms = [decode_term(*t) for t in table["terms"]]
+
+        view = memoryview(mm)[offset:offset + n_triples * 12]
+        if sys.byteorder == "little":
+            ids = view.cast("I")
+        else:
+            ids = array("I", view)
+            ids.byteswap()
+
+        it = iter(ids)
+        try:
+            g.addN((terms[s], terms[p], terms[o], g) for s, p, o in zip(it, it, it))
+        finally:
+            del it, ids
+            view.release()
+
+    return g
+
+def load_graph(owl_path, fmt=None):
+    """Load an ontology file, using its snapshot when it is newer than the file itself
+
+    When the ontology was saved in another format (populated_flights.nt.gz for
+    populated_flights.owl, ...), the newest of those files is read instead.
+    """
+
+    source = find_source(owl_path)
+    snap = snapshot_path(owl_path)
+    if os.path.exists(snap) and (not os.path.exists(source) or os.path.getmtime(snap) >= os.path.getmtime(source)):
+        return load_snapshot(snap)
+
+    g = read_graph(source, fmt)
+    write_snapshot(g, snap)
+    return g
+
+def save_graph(g, owl_path, fmt="xml"):
+    """Save the ontology in the given format (see rdf_output.FORMATS), refresh its snapshot and return the file written"""
+
+    path = write_graph(g, output_path(owl_path, fmt), fmt)
+    write_snapshot(g, snapshot_path(owl_path))
+    metrics.count("bytes_written", os.path.getsize(path) + os.path.getsize(snapshot_path(owl_path)))
+    return path
@@ -0,0 +1,242 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+from rdflib import Namespace
+from snapshot import load_graph
+from sqlite_store import open_store
+from query_cache import QueryCache
+from result_render import print_pages, export_results
+import query_basic
+import query_intermediate
+
+AIRPORT = Namespace("http://www.semanticweb.org/marikaitiprimenta/ontologies/2025/4/airports#")
+
+PREFIXES = {
+    "airport": AIRPORT,
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "owl": "http://www.w3.org/2002/07/owl#",
+}
+
+# (media type, rdflib format) in order of preference; the first entry is the default
+RESULT_FORMATS = [
+    ("application/sparql-results+json", "json"),
+    ("application/sparql-results+xml", "xml"),
+    ("text/csv", "csv"),
+    ("text/tab-separated-values", "tsv"),
+]
+GRAPH_FORMATS = [
+    ("text/turtle", "turtle"),
+    ("application/n-triples", "nt"),
+    ("application/rdf+xml", "xml"),
+    ("application/ld+json", "json-ld"),
+]
+
+MAX_BODY = 1 << 20  # Largest accepted request body (1 MB)
+
+_shared = {}                # QueryCache over the load-once graph, inherited by forked workers
+_local = threading.local()  # Per-worker QueryCache for a SQLite store, or for processes that are not forked
+
+def named_queries():
+    """Predefined queries of both query scripts, named basic:N and intermediate:N"""
+
+    queries = {}
+    for prefix, module in (("basic", query_basic), ("intermediate", query_intermediate)):
+        for key, query in module.defined_queries().items():
+            queries[f"{prefix}:{key}"] = query
+    return queries
+
+def open_graph(ontology, store=None):
+    """Load the ontology (or open the store) once and bind the prefixes the queries use"""
+
+    g = open_store(store) if store else load_graph(ontology)
+    for prefix, uri in PREFIXES.items():
+        g.bind(prefix, uri)
+    return g
+
+def resolve(name):
+    """SPARQL text for a predefined query name or a query file"""
+
+    queries = named_queries()
+    if name in queries:
+        return queries[name]["query"]
+    with open(name, encoding="utf-8") as f:
+        return f.read()
+
+def _init_worker(ontology, store, load=False):
+    # SQLite connections cannot be shared between threads or processes, so each worker opens its own.
+    # A process that was not forked has no copy of the loaded graph and loads it as well.
+    if store or load:
+        _local.cache = QueryCache(open_graph(ontology, store), named_queries())
+
+def _cache():
+    return getattr(_local, "cache", None) or _shared["cache"]
+
+def negotiate(accept, formats):
+    """Pick the (media type, format) pair for an Accept header"""
+
+    for media_type, fmt in formats:
+        if media_type in accept:
+            return media_type, fmt
+    return formats[0]
+
+def run_query(query, accept):
+    """Evaluate a read query and serialize it for the client, returning (status, content type, body)"""
+
+    try:
+        result = _cache().query(query)
+    except Exception as e: # Parse errors and updates sent to the query endpoint
+        return 400, "text/plain; charset=utf-8", f"Bad query: {e}\n".encode("utf-8")
+
+    formats = GRAPH_FORMATS if result.type in ("CONSTRUCT", "DESCRIBE") else RESULT_FORMATS
+    media_type, fmt = negotiate(accept, formats)
+    return 200, f"{media_type}; charset=utf-8", result.serialize(format=fmt)
+
+async def respond(method, target, headers, body, loop, pool):
+    """Handle one SPARQL 1.1 protocol request"""
+
+    url = urlsplit(target)
+    if url.path != "/sparql":
+        return 404, "text/plain; charset=utf-8", b"Not found; the endpoint is /sparql\n"
+
+    if method == "GET":
+        query = parse_qs(url.query).get("query", [None])[0]
+    elif method == "POST":
+        content_type = headers.get("content-type", "")
+        if content_type.startswith("application/sparql-query"):
+            query = body.decode("utf-8")
+        elif content_type.startswith("application/x-www-form-urlencoded"):
+            query = parse_qs(body.decode("utf-8")).get("query", [None])[0]
+        else:
+            return 415, "text/plain; charset=utf-8", b"Send application/sparql-query or a form-encoded query\n"
+    else:
+        return 405, "text/plain; charset=utf-8", b"Use GET or POST\n"
+
+    if not query:
+        return 400, "text/plain; charset=utf-8", b"Missing query parameter\n"
+    return await loop.run_in_executor(pool, run_query, query, headers.get("accept", ""))
+
+async def handle(reader, writer, pool):
+    """Serve the requests of one connection, keeping it open between requests when the client allows"""
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, target, version = request_line.decode("latin-1").split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", 0) or 0)
+            start = time.time()
+            if length > MAX_BODY:
+                status, content_type, payload = 413, "text/plain; charset=utf-8", b"Request body too large\n"
+                headers["connection"] = "close"
+            else:
+                body = await reader.readexactly(length)
+                status, content_type, payload = await respond(method, target, headers, body, loop, pool)
+            print(f"{method} {urlsplit(target).path} {status} {len(payload)} bytes in {(time.time() - start) * 1000:.1f} ms")
+
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            writer.write(
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ValueError, asyncio.IncompleteReadError, ConnectionError): # Malformed request or client gone
+        pass
+    finally:
+        writer.close()
+
+def serve(ontology, store, host, port, workers, processes):
+    """Run the HTTP endpoint; queries are evaluated in a pool of threads or processes
+
+    Processes are forked where the platform allows it, so they share the
+    graph loaded here. Where it does not (Windows), each process loads the
+    graph itself.
+    """
+
+    fork = processes and "fork" in multiprocessing.get_all_start_methods()
+    if not store and (fork or not processes):
+        _shared["cache"] = QueryCache(open_graph(ontology), named_queries()) # Loaded once, shared by every worker
+        print(f"Loaded {ontology} with {len(_shared['cache'].g)} triples")
+
+    if processes:
+        context = multiprocessing.get_context("fork" if fork else None) # fork is not the default everywhere (Python 3.14, macOS)
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                   initializer=_init_worker, initargs=(ontology, store, not fork))
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(ontology, store))
+
+    async def main():
+        server = await asyncio.start_server(lambda r, w: handle(r, w, pool), host, port)
+        print(f"SPARQL endpoint at http://{host}:{port}/sparql ({workers} {'processes' if processes else 'threads'})")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+def run_batch(ontology, store, names, export_dir=None, fmt="csv", page_size=30):
+    """Run predefined queries or query files one after another, printing or exporting their results"""
+
+    cache = QueryCache(open_graph(ontology, store), named_queries())
+    if export_dir:
+        os.makedirs(export_dir, exist_ok=True)
+
+    for name in names:
+        start = time.time()
+        query = name if name in cache.prepared else resolve(name) # Predefined queries are already prepared
+        if export_dir:
+            path = os.path.join(export_dir, f"{os.path.splitext(os.path.basename(name))[0].replace(':', '_')}.{fmt}")
+            count = export_results(cache.stream(query), path)
+            print(f"{name}: exported {count} rows to {path} in {time.time() - start:.2f}s")
+        else:
+            print(f"\n{name}:")
+            print_pages(cache.query(query), page_size, prompt=False)
+            print(f"{name}: {time.time() - start:.2f}s")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run queries in batch or serve the ontology over the SPARQL 1.1 protocol")
+    parser.add_argument("--ontology", default="populated_flights.owl", help="ontology file to load")
+    parser.add_argument("--store", help="query this persistent SQLite store instead of the ontology file")
+    parser.add_argument("--run", nargs="+", metavar="QUERY", help="predefined query names (e.g. intermediate:2) or .rq files to run")
+    parser.add_argument("--export-dir", help="write each --run result to this directory instead of printing it")
+    parser.add_argument("--format", default="csv", choices=["csv", "jsonl", "parquet"], help="export format for --export-dir")
+    parser.add_argument("--page-size", type=int, default=30, help="result rows per printed table")
+    parser.add_argument("--serve", action="store_true", help="start the HTTP SPARQL endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4, help="queries evaluated concurrently")
+    parser.add_argument("--processes", action="store_true", help="evaluate queries in forked processes instead of threads")
+    args = parser.parse_args()
+
+    if args.run:
+        run_batch(args.ontology, args.store, args.run, args.export_dir, args.format, args.page_size)
+    elif args.serve:
+        serve(args.ontology, args.store, args.host, args.port, args.workers, args.processes)
+    else:
+        for name, query in named_queries().items():
+            print(f"{name}\t{query['name']}")
+        sys.exit(0)
@@ -0,0 +1,260 @@
+import heapq
+import math
+import re
+import time
+from array import array
+from operator import itemgetter
+from rdflib import Namespace, Literal, XSD
+from rdflib.namespace import RDFS
+import sidecar
+
+AIRPORT = Namespace("http://www.semanticweb.org/marikaitiprimenta/ontologies/2025/4/airports#")
+
+SPATIAL_VERSION = 2
+EARTH_RADIUS_KM = 6371.0088
+
+POINT = re.compile(r"Point\(\s*([-+0-9.eE]+)\s+([-+0-9.eE]+)\s*\)")  # WKT as returned by Wikidata: Point(lon lat)
+
+def parse_point(wkt):
+    """(lat, lon) in degrees from a WKT Point literal, or None"""
+
+    match = POINT.search(str(wkt))
+    if match is None:
+        return None
+    lon, lat = float(match.group(1)), float(match.group(2))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+def _unit_vector(lat, lon):
+    lat, lon = math.radians(lat), math.radians(lon)
+    return math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)
+
+def _chord(km):
+    """Straight-line distance through the unit sphere for a great-circle distance"""
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+def _km(chord2):
+    """Great-circle distance for a squared chord length"""
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(chord2) / 2))
+
+def haversine_km(lats1, lons1, lats2, lons2):
+    """Great-circle distances in km between paired sequences of coordinates in degrees"""
+
+    radians = math.radians
+    return array("d", (
+        2 * EARTH_RADIUS_KM * math.asin(math.sqrt(
+            math.sin((radians(b_lat) - radians(a_lat)) / 2) ** 2 +
+            math.cos(radians(a_lat)) * math.cos(radians(b_lat)) * math.sin((radians(b_lon) - radians(a_lon)) / 2) ** 2))
+        for a_lat, a_lon, b_lat, b_lon in zip(lats1, lons1, lats2, lons2)))
+
+class SpatialIndex:
+    """k-d tree over the airport coordinates
+
+    Airports are placed on the unit sphere, where the straight-line (chord)
+    distance grows with the great-circle distance, so the tree needs no special
+    cases at the poles or the antimeridian. The tree is implicit: the airports
+    are stored in tree order and the node of a range is its middle element,
+    split on x, y and z in turn.
+    """
+
+    def __init__(self):
+        self.airports = []       # Airport URIs in tree order
+        self.lats = array("d")   # Degrees, in tree order
+        self.lons = array("d")
+        self.xyz = array("d")    # Unit vectors, three values per airport
+        self.position = {}       # airport -> position in the arrays
+
+    @classmethod
+    def from_graph(cls, g):
+        """Parse the hasCoordinates literals (the first valid point of each airport) and build the tree"""
+
+        points = {}
+        for airport, wkt in g.subject_objects(AIRPORT.hasCoordinates):
+            if airport not in points:
+                point = parse_point(wkt)
+                if point is not None:
+                    points[airport] = point
+        return cls.from_points(points.items())
+
+    @classmethod
+    def from_points(cls, points):
+        """Build the tree from (airport, (lat, lon)) pairs"""
+
+        nodes = [(*_unit_vector(lat, lon), airport, lat, lon) for airport, (lat, lon) in points]
+        stack = [(0, len(nodes), 0)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if hi - lo < 2:
+                continue
+            nodes[lo:hi] = sorted(nodes[lo:hi], key=itemgetter(axis))
+            mid = (lo + hi) // 2
+            stack.append((lo, mid, (axis + 1) % 3))
+            stack.append((mid + 1, hi, (axis + 1) % 3))
+
+        index = cls()
+        for x, y, z, airport, lat, lon in nodes:
+            index.position[airport] = len(index.airports)
+            index.airports.append(airport)
+            index.lats.append(lat)
+            index.lons.append(lon)
+            index.xyz.extend((x, y, z))
+        return index
+
+    def __len__(self):
+        return len(self.airports)
+
+    def coordinates(self, airport):
+        """(lat, lon) of an airport, or None"""
+
+        position = self.position.get(airport)
+        return None if position is None else (self.lats[position], self.lons[position])
+
+    def _search(self, lat, lon, limit2, k=None):
+        """(squared chord, position) of the airports within limit2, only the k nearest when k is given"""
+
+        qx, qy, qz = query = _unit_vector(lat, lon)
+        xyz = self.xyz
+        found = []  # Max-heap on distance when k is given
+        stack = [(0, len(self.airports), 0, 0.0)]
+        while stack:
+            lo, hi, axis, bound2 = stack.pop()
+            if lo >= hi:
+                continue
+            if k is not None and len(found) == k:
+                limit2 = -found[0][0]
+            if bound2 > limit2: # The splitting plane is already farther than the worst kept airport
+                continue
+
+            mid = (lo + hi) // 2
+            base = mid * 3
+            dx, dy, dz = qx - xyz[base], qy - xyz[base + 1], qz - xyz[base + 2]
+            d2 = dx * dx + dy * dy + dz * dz
+            if d2 <= limit2:
+                if k is None:
+                    found.append((d2, mid))
+                elif len(found) < k:
+                    heapq.heappush(found, (-d2, mid))
+                else:
+                    heapq.heapreplace(found, (-d2, mid))
+
+            diff = query[axis] - xyz[base + axis]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            child_axis = (axis + 1) % 3
+            stack.append((*far, child_axis, diff * diff))
+            stack.append((*near, child_axis, bound2))
+
+        if k is not None:
+            found = [(-d2, position) for d2, position in found]
+        return sorted(found)
+
+    def nearest(self, lat, lon, k=5):
+        """The k airports closest to a point, as (airport, km) pairs, closest first"""
+
+        if k <= 0:
+            return []
+        return [(self.airports[position], _km(d2)) for d2, position in self._search(lat, lon, 4.0, k)]
+
+    def within(self, lat, lon, km):
+        """Airports within km of a point, as (airport, km) pairs, closest first"""
+        return [(self.airports[position], _km(d2)) for d2, position in self._search(lat, lon, _chord(km) ** 2)]
+
+    def nearest_to(self, airport, k=5):
+        """The k airports closest to an airport, excluding itself"""
+
+        point = self.coordinates(airport)
+        if point is None:
+            return []
+        return [(other, km) for other, km in self.nearest(*point, k + 1) if other != airport][:k]
+
+    def distance(self, a, b):
+        """Great-circle distance between two airports in km, or None when either has no coordinates"""
+
+        pa, pb = self.coordinates(a), self.coordinates(b)
+        if pa is None or pb is None:
+            return None
+        return haversine_km((pa[0],), (pa[1],), (pb[0],), (pb[1],))[0]
+
+    def route_distances(self, routes):
+        """Great-circle km for each (dep, arr) airport pair that has coordinates at both ends"""
+
+        known = [(dep, arr) for dep, arr in routes if dep in self.position and arr in self.position]
+        deps = [self.position[dep] for dep, _ in known]
+        arrs = [self.position[arr] for _, arr in known]
+        lats, lons = self.lats, self.lons
+        distances = haversine_km([lats[p] for p in deps], [lons[p] for p in deps],
+                                 [lats[p] for p in arrs], [lons[p] for p in arrs])
+        return dict(zip(known, distances))
+
+    def flight_distances(self, flight_index):
+        """Great-circle km of every flight of a FlightIndex, aligned with flight_index.flights (nan when unknown)"""
+
+        per_route = self.route_distances(flight_index.routes)
+        distances = array("d", [math.nan]) * len(flight_index.flights)
+        for route, positions in flight_index.routes.items():
+            km = per_route.get(route)
+            if km is not None:
+                for position in positions:
+                    distances[position] = km
+        return distances
+
+def save_spatial(index, path):
+    """Write the spatial index next to an .owl file or store"""
+    sidecar.save(index, path, ".geo", SPATIAL_VERSION)
+
+def load_spatial(g, path):
+    """Load the spatial index for an .owl file or store, rebuilding it when the source is newer"""
+    return sidecar.load_or_build(path, ".geo", SPATIAL_VERSION, SpatialIndex, lambda: SpatialIndex.from_graph(g))
+
+def _name(g, airport):
+    iata = g.value(airport, AIRPORT.hasIATACode)
+    label = g.value(airport, RDFS.label)
+    return f"{label or airport.split('#')[-1]} ({iata or '-'})"
+
+if __name__ == "__main__":
+    import argparse
+    from tabulate import tabulate
+    from snapshot import load_graph
+    from sqlite_store import open_store
+
+    parser = argparse.ArgumentParser(description="Nearest-airport, radius and great-circle distance queries")
+    parser.add_argument("--ontology", default="populated_airports.owl", help="ontology file with the airports")
+    parser.add_argument("--store", help="use this persistent SQLite store instead of the ontology file")
+    parser.add_argument("--near", nargs=2, type=float, metavar=("LAT", "LON"), help="point to search around")
+    parser.add_argument("--airport", metavar="IATA", help="search around this airport instead of a point")
+    parser.add_argument("-k", type=int, default=5, help="number of nearest airports")
+    parser.add_argument("--radius", type=float, metavar="KM", help="list every airport within this distance instead")
+    parser.add_argument("--routes", type=int, metavar="N", help="list the N longest routes by great-circle distance")
+    args = parser.parse_args()
+
+    g = open_store(args.store) if args.store else load_graph(args.ontology)
+    index = load_spatial(g, args.store or args.ontology)
+
+    if args.airport:
+        origin = g.value(predicate=AIRPORT.hasIATACode, object=Literal(args.airport, datatype=XSD.string))
+        if index.coordinates(origin) is None:
+            parser.error(f"No coordinates for an airport with IATA code {args.airport}")
+        point = index.coordinates(origin)
+    elif args.near:
+        origin, point = None, tuple(args.near)
+    else:
+        origin = point = None
+
+    if point is not None:
+        start = time.perf_counter()
+        if args.radius is not None:
+            found = [(a, km) for a, km in index.within(*point, args.radius) if a != origin]
+        else:
+            found = index.nearest_to(origin, args.k) if origin is not None else index.nearest(*point, args.k)
+        elapsed = time.perf_counter() - start
+        if found:
+            print(tabulate([[_name(g, a), f"{km:.1f}"] for a, km in found], headers=["airport", "km"], tablefmt="grid"))
+        print(f"{len(found)} airports in {elapsed * 1000:.2f} ms")
+
+    if args.routes:
+        from flight_index import load_index
+        flights = load_index(g, args.store or args.ontology)
+        distances = index.route_distances(flights.routes)
+        longest = heapq.nlargest(args.routes, distances.items(), key=itemgetter(1))
+        print(tabulate([[_name(g, dep), _name(g, arr), f"{km:.1f}", len(flights.routes[dep, arr])] for (dep, arr), km in longest],
+                       headers=["from", "to", "km", "flights"], tablefmt="grid"))
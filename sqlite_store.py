@@ -0,0 +1,229 @@
+import os
+import sqlite3
+import sys
+from rdflib import Graph, URIRef, plugin
+from rdflib.store import Store, VALID_STORE, NO_STORE
+from snapshot import encode_term, decode_term
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    datatype TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    UNIQUE (kind, value, datatype, lang)
+);
+CREATE TABLE IF NOT EXISTS triples (
+    s INTEGER NOT NULL,
+    p INTEGER NOT NULL,
+    o INTEGER NOT NULL,
+    PRIMARY KEY (s, p, o)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS triples_pos ON triples (p, o, s);
+CREATE INDEX IF NOT EXISTS triples_osp ON triples (o, s, p);
+CREATE TABLE IF NOT EXISTS namespaces (
+    prefix TEXT PRIMARY KEY,
+    uri TEXT NOT NULL
+);
+"""
+
+class SQLiteStore(Store):
+    """Persistent, non context-aware rdflib store kept in a single SQLite file
+
+    Terms are dictionary-encoded in the terms table and triples are stored as
+    integer ids, so pattern lookups run on SQLite indexes and results are
+    streamed from disk instead of being held in memory.
+    """
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = True
+    graph_aware = False
+    dispatches_removals = True  # remove() fires TripleRemovedEvent, unlike rdflib's Memory store
+
+    CACHE_SIZE = 500000  # term <-> id pairs kept in memory
+
+    def __init__(self, configuration=None, identifier=None):
+        super().__init__(configuration)
+        self.identifier = identifier
+        self.conn = None
+        self.inserted = 0  # Triples inserted that were not already stored
+        self._ids = {}
+        self._terms = {}
+        if configuration:
+            self.open(configuration, create=True)
+
+    def open(self, configuration, create=False):
+        if not create and not os.path.exists(configuration):
+            return NO_STORE
+
+        self.conn = sqlite3.connect(configuration)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        return VALID_STORE
+
+    def close(self, commit_pending_transaction=True):
+        if self.conn is not None:
+            if commit_pending_transaction:
+                self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def _cache(self, cache, key, value):
+        if len(cache) >= self.CACHE_SIZE:
+            cache.clear()
+        cache[key] = value
+
+    def _term_id(self, term, create=False):
+        """Id of a term, inserting it if create is set (None when unknown)"""
+
+        term_id = self._ids.get(term)
+        if term_id is not None:
+            return term_id
+
+        key = encode_term(term)
+        if create:
+            self.conn.execute("INSERT OR IGNORE INTO terms (kind, value, datatype, lang) VALUES (?, ?, ?, ?)", key)
+        row = self.conn.execute(
+            "SELECT id FROM terms WHERE kind = ? AND value = ? AND datatype = ? AND lang = ?", key).fetchone()
+        if row is None:
+            return None
+
+        self._cache(self._ids, term, row[0])
+        return row[0]
+
+    def _term(self, term_id):
+        term = self._terms.get(term_id)
+        if term is None:
+            row = self.conn.execute("SELECT kind, value, datatype, lang FROM terms WHERE id = ?", (term_id,)).fetchone()
+            term = decode_term(*row)
+            self._cache(self._terms, term_id, term)
+        return term
+
+    def add(self, triple, context, quoted=False):
+        ids = tuple(self._term_id(term, create=True) for term in triple)
+        self.inserted += self.conn.execute("INSERT OR IGNORE INTO triples (s, p, o) VALUES (?, ?, ?)", ids).rowcount
+        super().add(triple, context, quoted)
+
+    def addN(self, quads):
+        """Add a batch of quads in one transaction"""
+
+        rows = []
+        for s, p, o, context in quads:
+            rows.append((self._term_id(s, create=True), self._term_id(p, create=True), self._term_id(o, create=True)))
+            super().add((s, p, o), context)
+
+        changes = self.conn.total_changes # Counted here, after the term inserts
+        self.conn.executemany("INSERT OR IGNORE INTO triples (s, p, o) VALUES (?, ?, ?)", rows)
+        self.inserted += self.conn.total_changes - changes
+        self.conn.commit()
+
+    def _select(self, triple_pattern):
+        """SQL cursor over the ids matching a pattern (None when a bound term is unknown)"""
+
+        clauses = []
+        params = []
+        for column, term in zip("spo", triple_pattern):
+            if term is None:
+                continue
+            term_id = self._term_id(term)
+            if term_id is None:
+                return None
+            clauses.append(f"{column} = ?")
+            params.append(term_id)
+
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self.conn.execute(f"SELECT s, p, o FROM triples{where}", params)
+
+    def triples(self, triple_pattern, context=None):
+        cursor = self._select(triple_pattern)
+        if cursor is None:
+            return
+
+        term = self._term
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            for s, p, o in rows:
+                yield (term(s), term(p), term(o)), iter(())
+
+    def remove(self, triple_pattern, context=None):
+        cursor = self._select(triple_pattern)
+        if cursor is None:
+            return
+
+        ids = cursor.fetchall()
+        self.conn.executemany("DELETE FROM triples WHERE s = ? AND p = ? AND o = ?", ids)
+        for s, p, o in ids:
+            super().remove((self._term(s), self._term(p), self._term(o)), context)
+
+    def __len__(self, context=None):
+        return self.conn.execute("SELECT COUNT(*) FROM triples").fetchone()[0]
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def bind(self, prefix, namespace, override=True):
+        namespace = str(namespace)
+        bound = self.conn.execute("SELECT uri FROM namespaces WHERE prefix = ?", (prefix,)).fetchone()
+        if bound is not None and not override:
+            return
+        if not override and self.prefix(namespace) is not None:
+            return
+
+        self.conn.execute("DELETE FROM namespaces WHERE uri = ?", (namespace,))
+        self.conn.execute("INSERT OR REPLACE INTO namespaces (prefix, uri) VALUES (?, ?)", (prefix, namespace))
+
+    def namespace(self, prefix):
+        row = self.conn.execute("SELECT uri FROM namespaces WHERE prefix = ?", (prefix,)).fetchone()
+        return URIRef(row[0]) if row else None
+
+    def prefix(self, namespace):
+        row = self.conn.execute("SELECT prefix FROM namespaces WHERE uri = ?", (str(namespace),)).fetchone()
+        return row[0] if row else None
+
+    def namespaces(self):
+        for prefix, uri in self.conn.execute("SELECT prefix, uri FROM namespaces").fetchall():
+            yield prefix, URIRef(uri)
+
+plugin.register("SQLite", Store, "sqlite_store", "SQLiteStore")
+
+def insert_count(g):
+    """Counter that grows by one for each new triple added to g, read without scanning the graph
+
+    A SQLiteStore counts its own inserts (len() would be a COUNT(*) over the
+    table); for rdflib's Memory store the graph size is kept as it changes.
+    """
+
+    inserted = getattr(g.store, "inserted", None)
+    return len(g) if inserted is None else inserted
+
+def open_store(path, seed=None, seed_format="xml"):
+    """Open (or create) a persistent graph, loading the seed file the first time the store is created"""
+
+    g = Graph(store="SQLite")
+    g.open(path, create=True)
+
+    if seed is not None and len(g) == 0:
+        g.parse(seed, format=seed_format)
+        g.commit()
+        print(f"Initialised store {path} from {seed}")
+    return g
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python sqlite_store.py STORE.db OUTPUT.owl")
+
+    g = open_store(sys.argv[1]) # Export a store back to RDF/XML (e.g. to open it in Protégé)
+    g.serialize(destination=sys.argv[2], format="xml")
+    g.close()
+    print(f"Exported {sys.argv[1]} to {sys.argv[2]}")
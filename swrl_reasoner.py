@@ -0,0 +1,669 @@
+import re
+import time
+from collections import defaultdict, namedtuple
+from rdflib import Namespace, Literal
+from rdflib.namespace import RDF
+
+AIRPORT = Namespace("http://www.semanticweb.org/marikaitiprimenta/ontologies/2025/4/airports#")
+
+Atom = namedtuple("Atom", "kind name args")   # kind: "class", "property" or "builtin"
+Rule = namedtuple("Rule", "name body head")
+
+# Groups (objects of `link`) whose members (subjects of `link`) reach `threshold`
+# are classified as `target`. With `distinct`, the distinct values of that
+# property over the members are counted instead of the members themselves.
+CountRule = namedtuple("CountRule", "name target link threshold distinct member_class group_class value_class")
+
+COUNT_KINDS = {
+    # kind: (link, distinct, value_class)
+    "departures": (AIRPORT.hasDepartureAirport, None, None),  # Flights departing from the airport
+    "arrivals": (AIRPORT.hasArrivalAirport, None, None),
+    "departing_flight_numbers": (AIRPORT.hasDepartureAirport, AIRPORT.hasFlightNumber, None),  # Rule 5
+    "arriving_flight_numbers": (AIRPORT.hasArrivalAirport, AIRPORT.hasFlightNumber, None),
+    "airlines": (AIRPORT.hasDepartureAirport, AIRPORT.operatedBy, AIRPORT.Airline),
+}
+
+ATOM_RE = re.compile(r"([\w:]+)\s*\(([^)]*)\)")
+
+BUILTINS = {
+    "equal": lambda a, b: a == b,
+    "notEqual": lambda a, b: a != b,
+    "greaterThan": lambda a, b: a > b,
+    "greaterThanOrEqual": lambda a, b: a >= b,
+    "lessThan": lambda a, b: a < b,
+    "lessThanOrEqual": lambda a, b: a <= b,
+}
+
+def _parse_arg(arg):
+    """Variables stay as '?x' strings, numbers become Literals and names become ontology URIs"""
+
+    if arg.startswith("?"):
+        return arg
+    try:
+        return Literal(int(arg))
+    except ValueError:
+        pass
+    try:
+        return Literal(float(arg))
+    except ValueError:
+        return AIRPORT[arg.split(":")[-1]]
+
+def _parse_atoms(text):
+    atoms = []
+    for name, args in ATOM_RE.findall(text):
+        args = tuple(_parse_arg(a.strip()) for a in args.split(","))
+        if name.startswith("swrlb:"):
+            builtin = name.split(":", 1)[1]
+            if builtin not in BUILTINS:
+                raise ValueError(f"Unsupported SWRL built-in {name}")
+            atoms.append(Atom("builtin", builtin, args))
+        elif len(args) == 1:
+            atoms.append(Atom("class", AIRPORT[name.split(":")[-1]], args))
+        else:
+            atoms.append(Atom("property", AIRPORT[name.split(":")[-1]], args))
+    return atoms
+
+def parse_rules(path="SWRL_rules.txt"):
+    """Parse the SWRL rules file (class, property and swrlb built-in atoms joined with ^)
+
+    Lines starting with # are comments; the first comment above a rule is used as its name.
+    """
+
+    rules = []
+    name = None
+    buffer = []
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("#"):
+                if not buffer and name is None:
+                    name = line.lstrip("# ").strip()
+                continue
+
+            buffer.append(line)
+            if "->" in line:  # heads are written on the same line as the arrow
+                body, head = " ".join(buffer).split("->")
+                rules.append(Rule(name or f"Rule {len(rules) + 1}", _parse_atoms(body), _parse_atoms(head)))
+                buffer = []
+                name = None
+
+    return rules
+
+def _value(term):
+    """Python value used by the built-ins"""
+    return term.toPython() if isinstance(term, Literal) else term
+
+class FactIndex:
+    """Class memberships and property assertions indexed for joins in both directions"""
+
+    def __init__(self):
+        self.members = defaultdict(set)
+        self.by_subject = defaultdict(lambda: defaultdict(set))
+        self.by_object = defaultdict(lambda: defaultdict(set))
+        self.pairs = defaultdict(set)
+        self.plans = {}
+
+    @classmethod
+    def from_graph(cls, g, rules):
+        """Index the facts of the classes and properties used in the rules"""
+
+        index = cls()
+        classes = {a.name for r in rules for a in r.body + r.head if a.kind == "class"}
+        properties = {a.name for r in rules for a in r.body if a.kind == "property"}
+
+        for c in classes:
+            for s in g.subjects(RDF.type, c):
+                index.add_member(c, s)
+        for p in properties:
+            for s, o in g.subject_objects(p):
+                index.add_pair(p, s, o)
+        return index
+
+    def is_member(self, c, x):
+        return x in self.members[c]
+
+    def add_member(self, c, x):
+        if x in self.members[c]:
+            return False
+        self.members[c].add(x)
+        return True
+
+    def add_pair(self, p, s, o):
+        self.by_subject[p][s].add(o)
+        self.by_object[p][o].add(s)
+        self.pairs[p].add((s, o))
+
+    def fanout(self, atom, bound):
+        """Estimated matches per input binding when the variables in `bound` are known (below 1 for a check)"""
+
+        args = [a in bound or not _is_var(a) for a in atom.args]
+        if atom.kind == "class":
+            return 1.0 if args[0] else len(self.members[atom.name])
+
+        pairs = len(self.pairs[atom.name])
+        subjects = max(1, len(self.by_subject[atom.name]))
+        objects = max(1, len(self.by_object[atom.name]))
+        if args[0] and args[1]:
+            return pairs / (subjects * objects)
+        if args[0]:
+            return pairs / subjects
+        if args[1]:
+            return pairs / objects
+        return pairs
+
+    def match(self, atom, bindings):
+        """Yield the bindings extended by each fact matching the atom"""
+
+        args = [_bound(a, bindings) for a in atom.args]
+
+        if atom.kind == "class":
+            x = args[0]
+            members = self.members[atom.name]
+            if x is not None:
+                if x in members:
+                    yield bindings
+            else:
+                for m in members:
+                    yield {**bindings, atom.args[0]: m}
+            return
+
+        s, o = args
+        s_var, o_var = atom.args
+        if s is not None and o is not None:
+            if o in self.by_subject[atom.name].get(s, ()):
+                yield bindings
+        elif s is not None:
+            for obj in self.by_subject[atom.name].get(s, ()):
+                yield {**bindings, o_var: obj}
+        elif o is not None:
+            for subj in self.by_object[atom.name].get(o, ()):
+                yield {**bindings, s_var: subj}
+        else:
+            for subj, obj in self.pairs[atom.name]:
+                if s_var == o_var and subj != obj:
+                    continue
+                yield {**bindings, s_var: subj, o_var: obj}
+
+class GraphFacts:
+    """FactIndex interface answered from the graph's own indexes, without loading every fact
+
+    Used for incremental reasoning, where only the neighbourhood of the
+    changed triples is visited. `removed` (a FactIndex) is added to the graph
+    to see the state before a change was applied.
+    """
+
+    def __init__(self, g, removed=None):
+        self.g = g
+        self.removed = removed
+        self.plans = {}
+
+    def is_member(self, c, x):
+        return (x, RDF.type, c) in self.g or (self.removed is not None and self.removed.is_member(c, x))
+
+    def fanout(self, atom, bound):
+        """Rough estimates: following a subject is cheap, following an object fans out, scans are expensive"""
+
+        args = [a in bound or not _is_var(a) for a in atom.args]
+        if atom.kind == "class":
+            return 1.0 if args[0] else 1e6
+        if args[0] and args[1]:
+            return 0.5
+        if args[0]:
+            return 2.0
+        if args[1]:
+            return 100.0
+        return 1e6
+
+    def match(self, atom, bindings):
+        """Yield the bindings extended by each fact matching the atom"""
+
+        args = [_bound(a, bindings) for a in atom.args]
+
+        if atom.kind == "class":
+            if args[0] is not None:
+                if self.is_member(atom.name, args[0]):
+                    yield bindings
+                return
+            for m in self.g.subjects(RDF.type, atom.name):
+                yield {**bindings, atom.args[0]: m}
+            if self.removed is not None:
+                yield from self.removed.match(atom, bindings)
+            return
+
+        s, o = args
+        s_var, o_var = atom.args
+        for subj, _, obj in self.g.triples((s, atom.name, o)):
+            if s is None and o is None and s_var == o_var and subj != obj:
+                continue
+            yield {**bindings, **({s_var: subj} if s is None else {}), **({o_var: obj} if o is None else {})}
+        if self.removed is not None:
+            yield from self.removed.match(atom, bindings)
+
+def _is_var(arg):
+    return isinstance(arg, str) and arg.startswith("?")
+
+def _bound(arg, bindings):
+    if _is_var(arg):
+        return bindings.get(arg)
+    return arg
+
+def _builtin_holds(atom, bindings):
+    try:
+        return BUILTINS[atom.name](*(_value(_bound(a, bindings)) for a in atom.args))
+    except TypeError:  # values that cannot be compared (e.g. a string and a number)
+        return False
+
+def _head_facts(rule, bindings):
+    return [(a.name, bindings[a.args[0]]) if isinstance(a.args[0], str) else (a.name, a.args[0]) for a in rule.head]
+
+def plan(rule, facts, bound=(), first=None):
+    """Order the body atoms for an index nested-loop join
+
+    Left-deep join orders are chosen by dynamic programming over subsets of
+    atoms, minimising the estimated number of intermediate bindings (from the
+    FactIndex fanouts). Starting from the `bound` variables (and the `first`
+    atom, if given); each built-in is placed right after the atom that binds
+    its last variable. Plans are cached on the FactIndex.
+    """
+
+    key = (id(rule), frozenset(bound), first)
+    if key in facts.plans:
+        return facts.plans[key]
+
+    joins = [i for i, a in enumerate(rule.body) if a.kind != "builtin"]
+    atom_vars = [{a for a in rule.body[i].args if _is_var(a)} for i in joins]
+    best = {0: (0.0, 1.0, [])}  # subset bitmask -> (cost, cardinality, order)
+
+    for mask in range(1 << len(joins)):
+        if mask not in best:
+            continue
+        cost, card, order = best[mask]
+        mask_vars = set(bound).union(*(atom_vars[k] for k in range(len(joins)) if mask >> k & 1))
+
+        for k, i in enumerate(joins):
+            if mask >> k & 1 or (mask == 0 and first is not None and i != first):
+                continue
+            new_card = card * facts.fanout(rule.body[i], mask_vars)
+            new_cost = cost + new_card
+            new_mask = mask | 1 << k
+            if new_mask not in best or new_cost < best[new_mask][0]:
+                best[new_mask] = (new_cost, new_card, order + [i])
+
+    bound = set(bound)
+    builtins = [i for i, a in enumerate(rule.body) if a.kind == "builtin"]
+    order = []
+    for i in [None] + best[(1 << len(joins)) - 1][2]:
+        if i is not None:
+            order.append(i)
+            bound.update(a for a in rule.body[i].args if _is_var(a))
+        for j in list(builtins):
+            if all(a in bound or not _is_var(a) for a in rule.body[j].args):
+                order.append(j)
+                builtins.remove(j)
+
+    if builtins:
+        raise ValueError(f"{rule.name}: built-in with a variable not bound by the body")
+    facts.plans[key] = order
+    return order
+
+def solutions(rule, facts, bindings=None, delta=None, prune=True):
+    """Yield the head facts of every way the rule body can be satisfied
+
+    The body is joined in the order chosen by plan() using the FactIndex
+    lookups. `delta` (atom position, FactIndex) restricts one atom to newly
+    derived facts for semi-naive evaluation; that atom is joined first. Once
+    all head variables are bound and the head facts are already known, the
+    branch is abandoned (unless `prune` is off), so rules like the hub rule
+    stop after the first witness instead of enumerating every combination.
+    """
+
+    bindings = dict(bindings or {})
+    order = plan(rule, facts, bindings, None if delta is None else delta[0])
+    head_vars = {a for atom in rule.head for a in atom.args if _is_var(a)}
+
+    # Step after which every head variable is bound (where pruning can start)
+    bound = set(bindings)
+    prune_from = 0 if head_vars <= bound else None
+    for step, i in enumerate(order):
+        bound.update(a for a in rule.body[i].args if _is_var(a))
+        if prune_from is None and head_vars <= bound:
+            prune_from = step + 1
+
+    def known(b):
+        return all(facts.is_member(c, x) for c, x in _head_facts(rule, b))
+
+    def search(step, b):
+        if prune and prune_from is not None and step >= prune_from and known(b):
+            return
+        if step == len(order):
+            yield _head_facts(rule, b)
+            return
+
+        atom = rule.body[order[step]]
+        if atom.kind == "builtin":
+            if _builtin_holds(atom, b):
+                yield from search(step + 1, b)
+            return
+
+        source = delta[1] if delta is not None and order[step] == delta[0] else facts
+        for extended in source.match(atom, b):
+            yield from search(step + 1, extended)
+
+    yield from search(0, bindings)
+
+def run_rules(g, rules, verbose=True):
+    """Materialize the rules over the graph with semi-naive forward chaining and add the inferred types"""
+
+    facts = FactIndex.from_graph(g, rules)
+    inferred = []
+
+    delta = None  # first round evaluates every rule over all facts
+    while True:
+        new = FactIndex()
+        for rule in rules:
+            start = time.perf_counter()
+            count = 0
+
+            if delta is None:
+                positions = [None]
+            else:
+                positions = [i for i, a in enumerate(rule.body) if a.kind == "class" and delta.members.get(a.name)]
+
+            for position in positions:
+                for head in solutions(rule, facts, delta=None if position is None else (position, delta)):
+                    for c, x in head:
+                        if facts.add_member(c, x):
+                            new.add_member(c, x)
+                            inferred.append((x, RDF.type, c))
+                            count += 1
+
+            if verbose and positions:
+                print(f"{rule.name}: {count} new facts in {time.perf_counter() - start:.2f}s")
+
+        if not any(new.members.values()):
+            break
+        delta = new
+
+    g.addN((s, p, o, g) for s, p, o in inferred)
+    return inferred
+
+def count_rule(kind, threshold, target):
+    """Count-threshold classification of airports by flights, distinct flight numbers or distinct airlines"""
+
+    link, distinct, value_class = COUNT_KINDS[kind]
+    return CountRule(f"{target} ({kind} >= {threshold})", AIRPORT[target], link, threshold,
+                     distinct, AIRPORT.Flight, AIRPORT.Airport, value_class)
+
+def hub_rule(threshold=4):
+    """Aggregate form of SWRL rule 5: airports with `threshold` departing flights with distinct flight numbers"""
+    return count_rule("departing_flight_numbers", threshold, "HubAirport")
+
+def load_rules(path="SWRL_rules.txt", hub_threshold=4, swrl_hubs=False):
+    """SWRL rules plus count rules; the self-join hub rule is replaced by one grouped count unless swrl_hubs"""
+
+    rules = parse_rules(path)
+    if swrl_hubs:
+        return rules, []
+    rules = [r for r in rules if all(a.name != AIRPORT.HubAirport for a in r.head)]
+    return rules, [hub_rule(hub_threshold)]
+
+def group_counts(g, rule, groups=None, cap=None):
+    """Count the members (or distinct values) of each group
+
+    Without `groups` this is one grouped pass over all the link triples. With
+    `groups` only those groups are visited, and each count stops at `cap`,
+    which is all a threshold test needs.
+    """
+
+    if groups is not None:
+        return {grp: _group_count(g, rule, grp, cap) for grp in groups}
+
+    members = set(g.subjects(RDF.type, rule.member_class)) if rule.member_class else None
+    values_ok = set(g.subjects(RDF.type, rule.value_class)) if rule.value_class else None
+
+    if rule.distinct is None:
+        counts = defaultdict(int)
+        for m, grp in g.subject_objects(rule.link):
+            if members is None or m in members:
+                counts[grp] += 1
+        return counts
+
+    member_values = defaultdict(list)  # one pass over the distinct property instead of a lookup per member
+    for m, v in g.subject_objects(rule.distinct):
+        member_values[m].append(v)
+
+    values = defaultdict(set)
+    for m, grp in g.subject_objects(rule.link):
+        if members is not None and m not in members:
+            continue
+        for v in member_values.get(m, ()):
+            if values_ok is None or v in values_ok:
+                values[grp].add(v)
+    return {grp: len(v) for grp, v in values.items()}
+
+def _group_count(g, rule, grp, cap=None):
+    """Count for a single group using graph lookups, stopping at cap"""
+
+    seen = set()
+    for m in g.subjects(rule.link, grp):
+        if rule.member_class and (m, RDF.type, rule.member_class) not in g:
+            continue
+        if rule.distinct is None:
+            seen.add(m)
+        else:
+            seen.update(v for v in g.objects(m, rule.distinct)
+                        if rule.value_class is None or (v, RDF.type, rule.value_class) in g)
+        if cap is not None and len(seen) >= cap:
+            break
+    return len(seen)
+
+def run_count_rules(g, count_rules, verbose=True):
+    """Assert the target class for every group that reaches its count threshold"""
+
+    inferred = []
+    for rule in count_rules:
+        start = time.perf_counter()
+        groups_ok = set(g.subjects(RDF.type, rule.group_class)) if rule.group_class else None
+
+        new = [(grp, RDF.type, rule.target) for grp, n in group_counts(g, rule).items()
+               if n >= rule.threshold and (groups_ok is None or grp in groups_ok)
+               and (grp, RDF.type, rule.target) not in g]
+        g.addN((s, p, o, g) for s, p, o in new)
+        inferred.extend(new)
+
+        if verbose:
+            print(f"{rule.name}: {len(new)} new facts in {time.perf_counter() - start:.2f}s")
+    return inferred
+
+def _unify(atom, triple):
+    """Bindings that make the atom match the triple, or None"""
+
+    s, p, o = triple
+    if atom.kind == "class":
+        pairs = [(atom.args[0], s)] if p == RDF.type and o == atom.name else None
+    elif atom.kind == "property" and p == atom.name:
+        pairs = [(atom.args[0], s), (atom.args[1], o)]
+    else:
+        pairs = None
+    if pairs is None:
+        return None
+
+    bindings = {}
+    for arg, term in pairs:
+        if not _is_var(arg):
+            if arg != term:
+                return None
+        elif bindings.setdefault(arg, term) != term:
+            return None
+    return bindings
+
+def _index(triples):
+    index = FactIndex()
+    for s, p, o in triples:
+        if p == RDF.type:
+            index.add_member(o, s)
+        index.add_pair(p, s, o)
+    return index
+
+def derivable(c, x, rules, facts):
+    """True if some rule with a head atom c(?v) holds for ?v = x"""
+
+    for rule in rules:
+        for atom in rule.head:
+            if atom.name == c and _is_var(atom.args[0]):
+                if next(solutions(rule, facts, {atom.args[0]: x}, prune=False), None) is not None:
+                    return True
+    return False
+
+def _count_groups(g, rule, triples):
+    """Groups of a count rule whose count can be changed by the triples"""
+
+    groups = set()
+    for s, p, o in triples:
+        if p == rule.link:
+            groups.add(o)
+        elif p == rule.distinct or (p == RDF.type and o == rule.member_class):
+            groups.update(g.objects(s, rule.link))
+        elif p == RDF.type and o in (rule.group_class, rule.target):
+            groups.add(s)
+    return groups
+
+def incremental_update(g, rules, count_rules, added, removed, verbose=True):
+    """Update the inferred facts after `added`/`removed` triples were applied to the graph
+
+    Rules are maintained with delete/rederive: facts derivable through a
+    removed triple (evaluated on the graph as it was) are retracted unless
+    another derivation still holds, then facts derivable through an added
+    triple are asserted. Derived changes are fed back until nothing changes.
+    Count rules are recomputed for the affected groups only. Every member of a
+    rule-head class is treated as inferred. Returns the inferred (added,
+    removed) triples.
+    """
+
+    start = time.perf_counter()
+    inferred_added = []
+    inferred_removed = []
+    delta_added, delta_removed = list(added), list(removed)
+
+    while delta_added or delta_removed:
+        old_facts = GraphFacts(g, removed=_index(delta_removed))
+        new_facts = GraphFacts(g)
+        round_added = []
+        round_removed = []
+
+        # facts that may have lost their derivation; inferred facts removed
+        # directly by the change are rederived if they still hold
+        head_classes = {a.name for rule in rules for a in rule.head}
+        candidates = set()
+        retracted = set()
+        for x, p, c in delta_removed:
+            if p == RDF.type and c in head_classes:
+                retracted.add((c, x))
+        for rule in rules:
+            for atom in rule.body:
+                for triple in delta_removed:
+                    bindings = _unify(atom, triple)
+                    if bindings is not None:
+                        for head in solutions(rule, old_facts, bindings, prune=False):
+                            candidates.update(head)
+
+        for c, x in candidates:
+            if (x, RDF.type, c) in g and not derivable(c, x, rules, new_facts):
+                g.remove((x, RDF.type, c))
+                round_removed.append((x, RDF.type, c))
+
+        for c, x in retracted:
+            if (x, RDF.type, c) not in g and derivable(c, x, rules, new_facts):
+                g.add((x, RDF.type, c))
+                round_added.append((x, RDF.type, c))
+
+        for rule in rules:
+            for atom in rule.body:
+                for triple in delta_added:
+                    bindings = _unify(atom, triple)
+                    if bindings is not None:
+                        for head in solutions(rule, new_facts, bindings):
+                            for c, x in head:
+                                if (x, RDF.type, c) not in g:
+                                    g.add((x, RDF.type, c))
+                                    round_added.append((x, RDF.type, c))
+
+        inferred_added += round_added
+        inferred_removed += round_removed
+        delta_added, delta_removed = round_added, round_removed
+
+    for rule in count_rules:
+        groups = _count_groups(g, rule, list(added) + list(removed))
+        counts = group_counts(g, rule, groups, cap=rule.threshold)
+        for grp in groups:
+            fact = (grp, RDF.type, rule.target)
+            holds = counts.get(grp, 0) >= rule.threshold and (
+                rule.group_class is None or (grp, RDF.type, rule.group_class) in g)
+            if holds and fact not in g:
+                g.add(fact)
+                inferred_added.append(fact)
+            elif not holds and fact in g:
+                g.remove(fact)
+                inferred_removed.append(fact)
+
+    if verbose:
+        print(f"Incremental update: {len(inferred_added)} facts inferred, {len(inferred_removed)} retracted "
+              f"in {time.perf_counter() - start:.2f}s")
+    return inferred_added, inferred_removed
+
+if __name__ == "__main__":
+    import argparse
+    from snapshot import load_graph, save_graph
+    from sqlite_store import open_store
+    from instrumentation import metrics, add_arguments, configure, finish
+    from rdf_output import FORMATS
+
+    parser = argparse.ArgumentParser(description="Run the SWRL rules over the populated ontology without Protégé")
+    parser.add_argument("--rules", default="SWRL_rules.txt", help="SWRL rules file")
+    parser.add_argument("--input", default="populated_flights.owl", help="ontology to reason over")
+    parser.add_argument("--output", help="where to save the ontology with the inferred facts (default: the input)")
+    parser.add_argument("--store", help="reason over this persistent SQLite store instead of an .owl file")
+    parser.add_argument("--hub-threshold", type=int, default=4,
+                        help="departing flights (distinct flight numbers) needed for HubAirport")
+    parser.add_argument("--swrl-hubs", action="store_true",
+                        help="evaluate the HubAirport SWRL rule itself instead of the grouped count")
+    parser.add_argument("--delta", help="only update the inferences affected by this RDF Patch changeset "
+                                         "(written by populate_intermediate.py --delta)")
+    parser.add_argument("--classify", action="append", default=[], metavar="KIND:THRESHOLD:CLASS",
+                        help=f"extra count classification of airports, KIND one of {', '.join(COUNT_KINDS)}")
+    parser.add_argument("--format", default="xml", choices=FORMATS, help="output format (see rdf_output.FORMATS)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    rules, count_rules = load_rules(args.rules, args.hub_threshold, args.swrl_hubs)
+    for spec in args.classify:
+        kind, threshold, target = spec.split(":")
+        count_rules.append(count_rule(kind, int(threshold), target))
+
+    with metrics.stage("load"):
+        g = open_store(args.store) if args.store else load_graph(args.input)
+    print(f"Loaded ontology with {len(g)} triples and {len(rules)} rules")
+
+    start = time.perf_counter()
+    with metrics.stage("reason"):
+        if args.delta:
+            from populate_intermediate import read_changeset
+            inferred, retracted = incremental_update(g, rules, count_rules, *read_changeset(args.delta))
+            metrics.count("facts_retracted", len(retracted))
+        else:
+            inferred = run_rules(g, rules) + run_count_rules(g, count_rules)
+            print(f"Inferred {len(inferred)} facts in {time.perf_counter() - start:.2f}s")
+        metrics.count("facts_inferred", len(inferred))
+
+    with metrics.stage("save"):
+        if args.store:
+            g.close()
+            print(f"Saved inferred facts to {args.store}")
+        else:
+            path = save_graph(g, args.output or args.input, args.format)
+            print(f"Saved inferred facts to {path}")
+    finish(args)
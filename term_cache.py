@@ -0,0 +1,63 @@
+from functools import lru_cache
+from rdflib import Literal, URIRef
+from instrumentation import metrics
+
+TERM_CACHE_SIZE = 200000  # Distinct terms kept per kind (URIs, literals)
+
+def _literal(value, datatype=None, lang=None):
+    return Literal(value, datatype=datatype, lang=lang)
+
+class TermCache:
+    """Bounded cache handing out one shared instance per distinct URI or literal
+
+    The populate scripts build the same terms over and over (airline names,
+    times, distances, airports, flight URIs repeated on every day they fly).
+    Taking them from here means each is constructed and hashed once and every
+    triple that mentions it points to the same object. The least recently used
+    terms are dropped once maxsize of a kind is reached.
+    """
+
+    def __init__(self, maxsize=TERM_CACHE_SIZE):
+        self.resize(maxsize)
+
+    def resize(self, maxsize):
+        """Start over with a new bound (None = unbounded)"""
+
+        self.maxsize = maxsize
+        self.uri = lru_cache(maxsize)(URIRef)
+        self.literal = lru_cache(maxsize, typed=True)(_literal)  # typed, so 1 and 1.0 stay different literals
+        self._terms = {}
+
+    def intern(self, term):
+        """The shared instance equal to term, for terms built elsewhere (e.g. unpickled from a worker)"""
+
+        shared = self._terms.get(term)
+        if shared is None:
+            if self.maxsize is not None and len(self._terms) >= self.maxsize:
+                self._terms.clear()
+            shared = self._terms[term] = term
+        return shared
+
+    def info(self):
+        """(hits, misses) over both kinds"""
+
+        uris, literals = self.uri.cache_info(), self.literal.cache_info()
+        return uris.hits + literals.hits, uris.misses + literals.misses
+
+terms = TermCache()  # Shared by the populate scripts of one run
+
+def count_terms():
+    """Record the cache hits and misses so far in the run metrics"""
+
+    hits, misses = terms.info()
+    if not hits and not misses: # Terms were built in worker processes
+        return
+    metrics.count("term_cache_hits", hits)
+    metrics.count("term_cache_misses", misses)
+
+def add_arguments(parser):
+    parser.add_argument("--term-cache-size", type=int, default=TERM_CACHE_SIZE,
+                        help="distinct URIs and literals kept for reuse while populating (0 = unbounded)")
+
+def configure(args):
+    terms.resize(args.term_cache_size or None)
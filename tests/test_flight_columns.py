@@ -0,0 +1,42 @@
+import pytest
+from rdflib import Graph, Literal, XSD
+from rdflib.namespace import RDF
+
+from flight_columns import AIRPORT, FlightColumns, clock_minutes
+
+TIMES = {"Flight_A": "05:17", "Flight_B": "11:59", "Flight_C": "12:00", "Flight_D": "24:00", "Flight_E": "11:81"}
+
+@pytest.fixture
+def store():
+    g = Graph()
+    for name, dep_time in TIMES.items():
+        flight = AIRPORT[name]
+        g.add((flight, RDF.type, AIRPORT.Flight))
+        g.add((flight, AIRPORT.hasDepartureTime, Literal(dep_time, datatype=XSD.string)))
+        g.add((flight, AIRPORT.hasDistance, Literal(len(name) * 100 + ord(name[-1]), datatype=XSD.integer)))
+    return FlightColumns.from_graph(g)
+
+def clock_or_none(hhmm):
+    try:
+        return clock_minutes(hhmm)
+    except ValueError:
+        return None
+
+def test_morning_flights_match_the_string_comparison(store):
+    expected = sorted((t, AIRPORT[n]) for n, t in TIMES.items() if clock_or_none(t) is not None and t < "12:00")
+    assert store.morning_flights() == [flight for _, flight in expected]
+
+def test_midnight_sorts_last():
+    assert clock_minutes("24:00") == 1440
+    assert clock_minutes("00:00") == 0
+
+@pytest.mark.parametrize("bound", ["bad", "11:81", "25:00", "24:01", "7:5", ""])
+def test_bad_time_bounds_raise(store, bound):
+    with pytest.raises(ValueError):
+        store.select(dep_time=(bound, None))
+    with pytest.raises(ValueError):
+        store.morning_flights(before=bound)
+
+def test_bad_number_bound_raises(store):
+    with pytest.raises(ValueError):
+        store.select(distance=("far", None))
@@ -0,0 +1,126 @@
+import re
+
+import pytest
+from rdflib import Graph, Literal, URIRef, XSD
+from rdflib.compare import isomorphic
+from rdflib.namespace import OWL, RDF, RDFS
+
+from benchmark import synthetic_airports
+from populate_basic import AIRPORT, populate_ontology
+
+def three_pass(g, airport_data):
+    """populate_ontology as it was before the single pass: countries, then cities, then airports over every row"""
+
+    country_map = {}
+    city_map = {}
+    runway_map = {}
+
+    for airport in airport_data:
+        if 'country' in airport:
+            country_uri = airport['country']['value']
+            country_label = airport['countryLabel']['value']
+            country_id = country_uri.split('/')[-1]
+            if country_id not in country_map:
+                country_entity = AIRPORT[f"Country_{country_id}"]
+                country_map[country_id] = country_entity
+                g.add((country_entity, RDF.type, AIRPORT.Country))
+                g.add((country_entity, RDFS.label, Literal(country_label, lang="en")))
+                g.add((country_entity, OWL.sameAs, URIRef(country_uri)))
+                g.add((country_entity, AIRPORT.hasName, Literal(country_label, datatype=XSD.string)))
+
+    for airport in airport_data:
+        if 'city' in airport:
+            city_uri = airport['city']['value']
+            city_label = airport['cityLabel']['value']
+            city_id = city_uri.split('/')[-1]
+            if city_id not in city_map:
+                city_entity = AIRPORT[f"City_{city_id}"]
+                city_map[city_id] = city_entity
+                g.add((city_entity, RDF.type, AIRPORT.City))
+                g.add((city_entity, RDFS.label, Literal(city_label, lang="en")))
+                g.add((city_entity, OWL.sameAs, URIRef(city_uri)))
+                if 'country' in airport:
+                    country_id = airport['country']['value'].split('/')[-1]
+                    if country_id in country_map:
+                        g.add((city_entity, AIRPORT.isLocatedIn, country_map[country_id]))
+
+    for airport in airport_data:
+        if 'airport' not in airport or 'airportLabel' not in airport:
+            continue
+
+        airport_uri = airport['airport']['value']
+        airport_entity = AIRPORT[f"Airport_{airport_uri.split('/')[-1]}"]
+        g.add((airport_entity, RDF.type, AIRPORT.Airport))
+        g.add((airport_entity, RDFS.label, Literal(airport['airportLabel']['value'], lang="en")))
+        g.add((airport_entity, OWL.sameAs, URIRef(airport_uri)))
+
+        if 'iata' in airport:
+            g.add((airport_entity, AIRPORT.hasIATACode, Literal(airport['iata']['value'], datatype=XSD.string)))
+        if 'icao' in airport:
+            g.add((airport_entity, AIRPORT.hasICAOCode, Literal(airport['icao']['value'], datatype=XSD.string)))
+        if 'coord' in airport:
+            g.add((airport_entity, AIRPORT.hasCoordinates, Literal(airport['coord']['value'], datatype=XSD.string)))
+
+        if 'runway' in airport:
+            runway_id = airport['runway']['value'].split('/')[-1]
+            if runway_id not in runway_map:
+                runway_sanitized = re.sub(r'\W+', '_', runway_id.strip())
+                runway_entity = AIRPORT[f"Runway_{runway_sanitized}"]
+                runway_map[runway_id] = runway_entity
+                g.add((runway_entity, RDF.type, AIRPORT.Runway))
+                if 'runwayLabel' in airport:
+                    g.add((runway_entity, RDFS.label, Literal(airport['runwayLabel']['value'], lang="en")))
+                if 'runwayLength' in airport:
+                    g.add((runway_entity, AIRPORT.hasRunwayLen, Literal(airport['runwayLength']['value'], datatype=XSD.decimal)))
+            g.add((airport_entity, AIRPORT.hasRunway, runway_map[runway_id]))
+
+        if 'country' in airport:
+            country_id = airport['country']['value'].split('/')[-1]
+            if country_id in country_map:
+                g.add((airport_entity, AIRPORT.isLocatedIn, country_map[country_id]))
+        if 'city' in airport:
+            city_id = airport['city']['value'].split('/')[-1]
+            if city_id in city_map:
+                g.add((airport_entity, AIRPORT.servesCity, city_map[city_id]))
+
+    return g
+
+def uri(number):
+    return {"type": "uri", "value": f"http://www.wikidata.org/entity/Q{number}"}
+
+def literal(value):
+    return {"type": "literal", "value": str(value)}
+
+def row(airport, iata, country, city, runway=None, length=None, **extra):
+    binding = {
+        "airport": uri(airport), "airportLabel": literal(f"Airport {iata}"), "iata": literal(iata),
+        "country": uri(country), "countryLabel": literal(f"Country {country}"),
+        "city": uri(city), "cityLabel": literal(f"City {city}"),
+    }
+    if runway is not None:
+        binding.update(runway=uri(runway), runwayLabel=literal(f"Runway {runway}"))
+    if length is not None:
+        binding["runwayLength"] = literal(length)
+    binding.update(extra)
+    return binding
+
+BINDINGS = [
+    row(1, "JFK", 30, 60, runway=900, length=4423, coord=literal("Point(-73.78 40.64)")),
+    row(1, "JFK", 30, 60, runway=900, length=4423, coord=literal("Point(-73.78 40.64)")),  # Duplicated runway row
+    row(1, "JFK", 30, 60, runway=901),                     # Runway without a length
+    row(2, "EWR", 30, 61, runway=902),                     # Length only on a later row of the runway
+    row(2, "EWR", 30, 61, runway=902, length=3048),
+    row(3, "LHR", 31, 62, runway=900),                     # Runway shared with another airport
+    row(3, "LTN", 31, 62, icao=literal("EGLL")),           # Second IATA value for the same airport
+    row(4, "CDG", 32, 60),                                 # City seen first with another country
+    {"country": uri(33), "countryLabel": literal("Country 33"),
+     "city": uri(63), "cityLabel": literal("City 63")},   # No airport, still defines a country and city
+]
+
+@pytest.mark.parametrize("bindings", [BINDINGS, synthetic_airports(300)], ids=["edge_cases", "synthetic"])
+def test_single_pass_matches_three_passes(bindings):
+    expected = three_pass(Graph(), bindings)
+    g = populate_ontology(Graph(), bindings)
+
+    assert len(g) == len(expected)
+    assert isomorphic(g, expected)
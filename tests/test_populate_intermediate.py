@@ -0,0 +1,121 @@
+import csv
+
+import pytest
+from rdflib import Graph, Literal, XSD
+from rdflib.compare import isomorphic
+from rdflib.namespace import RDF
+
+from populate_intermediate import (AIRPORT, SinkFilter, apply_delta, build_iata_map, convert_batch, flight_triples,
+                                   net_changes, read_changeset, stream_ontology, write_changeset)
+
+COLUMNS = ["id", "year", "month", "day", "dep_time", "sched_dep_time", "dep_delay", "arr_time", "sched_arr_time",
+           "arr_delay", "carrier", "flight", "tailnum", "origin", "dest", "air_time", "distance", "hour", "minute",
+           "time_hour", "name"]
+
+def flight(origin, dest, number, name, dep_time="517.0", arr_time="830.0", air_time="227.0", distance="1400"):
+    row = dict.fromkeys(COLUMNS, "")
+    row.update(dep_time=dep_time, arr_time=arr_time, flight=number, origin=origin, dest=dest,
+               air_time=air_time, distance=distance, name=name)
+    return [row[column] for column in COLUMNS]
+
+ROWS = [
+    flight("EWR", "IAH", "1545", "United Air Lines Inc."),
+    flight("LGA", "IAH", "1714", "United Air Lines Inc.", dep_time="533.0", arr_time="850.0"),
+    flight("JFK", "MIA", "1141", "American Airlines Inc.", dep_time="", arr_time=""),
+    flight("JFK", "BQN", "725", "JetBlue Airways", air_time="", distance=""),
+    flight("LGA", "ATL", "461", "Delta Air Lines Inc.", dep_time="2400.0", air_time="45.5"),
+    flight("EWR", "XXX", "1696", "ExpressJet Airlines Inc."),  # Unknown airport, skipped
+    flight("EWR", "IAH", "1545", "United Air Lines Inc.", dep_time="1015.0"),  # Same flight on another day
+    flight("EWR", "ORD", "1696", "ExpressJet Airlines Inc."),
+    flight("JFK", "MIA", "1141", "American Airlines Inc."),
+    flight("LGA", "IAH", "1714", "United Air Lines Inc."),
+]
+
+def airports():
+    g = Graph()
+    for code in ("EWR", "LGA", "JFK", "IAH", "MIA", "BQN", "ATL", "ORD"):
+        airport = AIRPORT[f"Airport_{code}"]
+        g.add((airport, RDF.type, AIRPORT.Airport))
+        g.add((airport, AIRPORT.hasIATACode, Literal(code, datatype=XSD.string)))
+    return g
+
+@pytest.fixture
+def flights_csv(tmp_path):
+    path = tmp_path / "flights.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(ROWS)
+    return str(path)
+
+def test_convert_batch_matches_flight_triples():
+    iata_map = build_iata_map(airports())
+    airlines_map = {}
+    expected = [t for row in ROWS for t in flight_triples(row, iata_map, airlines_map)]
+    assert convert_batch(ROWS, iata_map, {}) == expected
+
+@pytest.mark.parametrize("batch_size", [1, 3, len(ROWS) + 5])  # 3 does not divide the row count
+def test_columnar_and_row_wise_graphs_are_isomorphic(flights_csv, batch_size):
+    columnar, row_wise = airports(), airports()
+    stream_ontology(columnar, flights_csv, batch_size, columnar=True)
+    stream_ontology(row_wise, flights_csv, batch_size, columnar=False)
+
+    assert len(columnar) > len(airports())
+    assert isomorphic(columnar, row_wise)
+
+@pytest.mark.parametrize("batch_size", [1, 3, len(ROWS) + 5])
+def test_batch_size_does_not_change_the_graph(flights_csv, batch_size):
+    whole, batched = airports(), airports()
+    stream_ontology(whole, flights_csv, len(ROWS))
+    stream_ontology(batched, flights_csv, batch_size)
+
+    assert isomorphic(whole, batched)
+
+def test_store_counts_only_new_triples(flights_csv, tmp_path):
+    from sqlite_store import open_store
+
+    memory = airports()
+    expected = stream_ontology(memory, flights_csv, 3)["triples"]
+
+    store = open_store(str(tmp_path / "flights.db"))
+    store.addN((s, p, o, store) for s, p, o in airports())
+    assert stream_ontology(store, flights_csv, 3)["triples"] == expected == len(memory) - len(airports())
+    assert stream_ontology(store, flights_csv, 3)["triples"] == 0
+    store.close()
+
+def test_changeset_replays_delta_and_inferences(flights_csv, tmp_path):
+    g = airports()
+    stream_ontology(g, flights_csv, len(ROWS))
+    old = set(g)
+
+    delta = tmp_path / "delta.csv"
+    with open(delta, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS + ["action"])
+        writer.writerow(flight("JFK", "ATL", "99", "Delta Air Lines Inc.") + ["add"])
+        writer.writerow(flight("EWR", "IAH", "1545", "United Air Lines Inc.", dep_time="700.0") + ["update"])
+        writer.writerow(flight("LGA", "ATL", "461", "Delta Air Lines Inc.") + ["cancel"])
+    added, removed = apply_delta(g, str(delta))
+
+    # What incremental_update might report: a new fact, a removed triple derived again,
+    # and a fact asserted in one round and retracted in a later one
+    new_fact = (AIRPORT.Airport_JFK, RDF.type, AIRPORT.HubAirport)
+    gone_fact = (AIRPORT.Airport_LGA, RDF.type, AIRPORT.HubAirport)
+    for triple in (new_fact, removed[0], gone_fact):
+        g.add(triple)
+    g.remove(gone_fact)
+
+    path = str(tmp_path / "flights.rdfp")
+    write_changeset(path, *net_changes(g, added + [new_fact, removed[0], gone_fact], removed + [gone_fact]))
+    patch_added, patch_removed = read_changeset(path)
+    assert set(old) - set(patch_removed) | set(patch_added) == set(g)
+
+def test_sink_filter_drops_repeats_within_the_window():
+    airline = "<http://x#Airline_Delta> <http://x#name> \"Delta\" .\n"
+    def lines(number):
+        return [f"<http://x#Flight_{number}> <http://x#p> \"{number}\" .\n", airline]
+
+    written = SinkFilter(max_flights=2)
+    assert written.fresh(lines(1) + lines(2)) == lines(1) + lines(2)[:1]
+    assert written.fresh(lines(1) + lines(3)) == lines(3)[:1]  # Flight 1 is still in the window
+    assert written.fresh(lines(1) + lines(2)) == lines(2)[:1]  # Flight 2 was evicted by flight 3
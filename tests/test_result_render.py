@@ -0,0 +1,29 @@
+from rdflib import Graph, Literal, Namespace
+
+from query_cache import QueryCache, RowStream
+from result_render import export_results
+
+EX = Namespace("http://example.org/")
+
+QUERY = "SELECT ?s ?label WHERE { ?s <http://example.org/label> ?label } ORDER BY ?label"
+
+def graph(n=50):
+    g = Graph()
+    for i in range(n):
+        g.add((EX[f"item{i}"], EX.label, Literal(f"label {i:03d}")))
+    return g
+
+def test_stream_is_not_kept(tmp_path):
+    cache = QueryCache(graph())
+    result = cache.stream(QUERY)
+
+    assert isinstance(result, RowStream)
+    assert export_results(result, str(tmp_path / "out.csv")) == 50
+    assert list(result) == []  # Single pass: the rows are gone once written
+
+def test_streamed_export_matches_the_cached_result(tmp_path):
+    cache = QueryCache(graph())
+    export_results(cache.stream(QUERY), str(tmp_path / "streamed.jsonl"))
+    export_results(cache.query(QUERY), str(tmp_path / "cached.jsonl"))
+
+    assert (tmp_path / "streamed.jsonl").read_text() == (tmp_path / "cached.jsonl").read_text()
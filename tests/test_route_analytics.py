@@ -0,0 +1,42 @@
+import pytest
+from rdflib import Graph, Literal, XSD
+from rdflib.namespace import RDF
+
+from route_analytics import AIRPORT, RouteGraph, literal_minutes, to_minutes
+
+def flight(g, name, dep, arr, dep_time, arr_time):
+    uri = AIRPORT[name]
+    g.add((uri, RDF.type, AIRPORT.Flight))
+    g.add((uri, AIRPORT.hasDepartureAirport, AIRPORT[dep]))
+    g.add((uri, AIRPORT.hasArrivalAirport, AIRPORT[arr]))
+    g.add((uri, AIRPORT.hasDepartureTime, Literal(dep_time, datatype=XSD.string)))
+    g.add((uri, AIRPORT.hasArrivalTime, Literal(arr_time, datatype=XSD.string)))
+
+@pytest.fixture
+def routes():
+    g = Graph()
+    flight(g, "Flight_1", "JFK", "ORD", "08:00", "10:00")
+    flight(g, "Flight_2", "ORD", "LAX", "11:30", "14:00")
+    flight(g, "Flight_3", "JFK", "LAX", "24:00", "06:00")  # Midnight as populate_intermediate writes it
+    return RouteGraph.from_graph(g)
+
+def test_to_minutes():
+    assert to_minutes("00:00") == 0
+    assert to_minutes("23:59") == 23 * 60 + 59
+
+@pytest.mark.parametrize("value", ["24:00", "24:30", "12:60", "7:5", "noon", ""])
+def test_to_minutes_rejects_invalid_times(value):
+    with pytest.raises(ValueError):
+        to_minutes(value)
+
+def test_midnight_in_the_data_is_minute_zero():
+    assert literal_minutes("24:00") == 0
+    assert literal_minutes("24:30") is None
+
+def test_fastest(routes):
+    legs = routes.fastest(AIRPORT.JFK, AIRPORT.LAX, "07:00")
+    assert [leg[0] for leg in legs] == [AIRPORT.Flight_1, AIRPORT.Flight_2]
+
+def test_fastest_rejects_a_bad_departure(routes):
+    with pytest.raises(ValueError):
+        routes.fastest(AIRPORT.JFK, AIRPORT.LAX, "25:00")
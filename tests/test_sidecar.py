@@ -0,0 +1,48 @@
+import os
+
+import sidecar
+
+class Thing:
+    def __init__(self, value):
+        self.value = value
+
+def build_counter(value):
+    calls = []
+    def build():
+        calls.append(value)
+        return Thing(value)
+    return build, calls
+
+def test_saved_object_is_loaded_instead_of_rebuilt(tmp_path):
+    source = str(tmp_path / "flights.owl")
+    open(source, "w").close()
+    build, calls = build_counter(1)
+
+    assert sidecar.load_or_build(source, ".thing", 1, Thing, build).value == 1
+    assert sidecar.load_or_build(source, ".thing", 1, Thing, build).value == 1
+    assert calls == [1]
+
+def test_compressed_round_trip(tmp_path):
+    source = str(tmp_path / "flights.owl")
+    open(source, "w").close()
+    sidecar.save(Thing([1, 2]), source, ".thing", 1, compress=True)
+
+    assert sidecar.load(source, ".thing", 1, Thing).value == [1, 2]
+
+def test_stale_other_version_or_unreadable_files_are_rebuilt(tmp_path):
+    source = str(tmp_path / "flights.owl")
+    open(source, "w").close()
+    sidecar.save(Thing(1), source, ".thing", 1)
+    path = sidecar.sidecar_path(source, ".thing")
+
+    assert sidecar.load(source, ".thing", 2, Thing) is None
+
+    os.utime(source, (os.path.getmtime(path) + 10,) * 2)
+    assert sidecar.load(source, ".thing", 1, Thing) is None
+
+    with open(path, "wb") as f:
+        f.write(b"not a pickle")
+    os.utime(source, (os.path.getmtime(path) - 10,) * 2)
+    build, calls = build_counter(2)
+    assert sidecar.load_or_build(source, ".thing", 1, Thing, build).value == 2
+    assert calls == [2]